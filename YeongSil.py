@@ -1,162 +1,354 @@
 import cv2
-import torch
 import numpy as np
 import time
+import random
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from google import genai
 from google.genai import types
 from config import GEMINI_KEY
+from depth_server import DEFAULT_ADDRESS, DepthClient
+from frame_cache import FrameSimilarityCache, dhash_bytes
+from offload import run_offloaded
+from response_cache import ResponseCache, response_key
+from tracing import tracer
 
-device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
+# two_call: description request, then a second text-only guidance request
+# single_shot: depth buckets first, then one multimodal request that returns the guidance directly
+# ab: pick one of the two at random per scan so both can be compared in production
+GUIDANCE_MODES = ('two_call', 'single_shot', 'ab')
+
+GUIDANCE_INSTRUCTIONS = 'Please advise in 1-2 sentences of 2 clauses max with environmental context, with instructions including angle of travel first.'
+
+def depth_prompt(depth_buckets: list[float]) -> str:
+    """Depth table given to Gemini alongside the scene"""
+    depth_desc = '\n'.join([f'{dist} degrees: {depth_buckets[i]:.2f} units of space' for i, dist in enumerate(range(-85, 85, 10))])
+    return f'The depth values are from 0-180 degrees, and how many units forward there, where 90 degrees is directly forward, but refer to them as 0-90 degrees right or left: {depth_desc}.'
+
+def guidance_parts(depth_buckets: list[float], image_bytes: bytes = None, description: str = None) -> list:
+    """Prompt parts of the final guidance request: image + depth table for single_shot, the earlier
+    description + depth table (text only) for two_call"""
+    if description is None:
+        return [
+            image_bytes,
+            'Please advise the blind user on how to traverse the environment in this image, referring to it as "your view" and noting the positions of large/major objects (far left, left, middle, right, far right).',
+            depth_prompt(depth_buckets),
+            GUIDANCE_INSTRUCTIONS
+        ]
+    return [
+        f'Please advise the blind user on how to traverse the following environment: {description}.',
+        depth_prompt(depth_buckets),
+        GUIDANCE_INSTRUCTIONS
+    ]
+
+# Sentence ends always split; commas only once the clause is long enough to be worth speaking on its own
+_SPEECH_BOUNDARY = re.compile(r'([.!?;:]|,)\s+')
+
+def speech_chunks(pieces, min_clause_chars: int = 20):
+    """Regroup streamed text pieces into sentence/clause sized chunks for speech synthesis"""
+    buffer = ''
+    for piece in pieces:
+        buffer += piece
+        while True:
+            cut = None
+            for match in _SPEECH_BOUNDARY.finditer(buffer):
+                if match.group(1) == ',' and match.start() < min_clause_chars:
+                    continue
+                cut = match.end()
+                break
+            if cut is None:
+                break
+            chunk, buffer = buffer[:cut].strip(), buffer[cut:]
+            if chunk:
+                yield chunk
+    if buffer.strip():
+        yield buffer.strip()
 
 class YeongSil:
-    def __init__(self):
-        self.gemini = genai.Client(api_key=GEMINI_KEY)
-
-        # Use faster MiDaS model for better performance
-        midas_transforms = torch.hub.load("intel-isl/MiDaS", "transforms")
-        self.transform = midas_transforms.small_transform  # Faster transform
-        self.midas = torch.hub.load("intel-isl/MiDaS", 'MiDaS_small')  # Faster model
-        self.midas.to(device)
-        self.midas.eval()
-
-    # Takes some image and returns a description of the image from gemini and angle buckets of average depth
-    def __process_image(self, image_path: str) -> tuple[str, list[float]]:
-        start_time = time.time()
-        print(f"[{0:.1f}s] Starting YeongSil image processing...")
-        
+    def __init__(self, max_workers: int = 4, max_batch_size: int = 8, max_batch_wait_ms: float = 5.0,
+                 native_depth_resolution: bool = False, depth_backend: str = 'torch',
+                 similarity_threshold: int = 6, similarity_ttl: float = 10.0,
+                 gemini_client=None, response_cache: ResponseCache = None, guidance_mode: str = 'two_call',
+                 temporal_depth: bool = False, offload=None, depth_client=None):
+        # Both can be injected, e.g. a local stub client for offline tests
+        self.gemini = gemini_client if gemini_client is not None else genai.Client(api_key=GEMINI_KEY)
+        self.response_cache = response_cache if response_cache is not None else ResponseCache()
+
+        # Thread pool for Gemini requests that overlap with local depth estimation
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='yeongsil')
+
+        # Hook for CPU-bound steps (model loading, decode, frame hashing, pre/post-processing, the MiDaS
+        # forward pass), e.g. eventlet's native thread pool, see offload.py
+        self.offload = offload
+
+        # Local depth pipeline (MiDaS, batching, bucketing, temporal reuse), or a depth_client talking to
+        # a shared depth_server.py process, in which case this instance loads no model and only talks to Gemini
+        if depth_client is not None:
+            self.depth = depth_client
+        else:
+            from depth_pipeline import DepthPipeline  # torch and the model code only load when depth is local
+            self.depth = DepthPipeline(depth_backend, max_batch_size=max_batch_size, max_batch_wait_ms=max_batch_wait_ms,
+                                       native_depth_resolution=native_depth_resolution,
+                                       temporal_depth=temporal_depth, offload=offload)
+        self.remote_depth = depth_client is not None
+
+        # Per-session reuse of results for near-identical frames (Hamming distance of dHash <= threshold)
+        self.frame_cache = FrameSimilarityCache(max_distance=similarity_threshold, ttl=similarity_ttl)
+
+        if guidance_mode not in GUIDANCE_MODES:
+            raise ValueError(f"Unknown guidance mode '{guidance_mode}', expected one of {', '.join(GUIDANCE_MODES)}")
+        self.guidance_mode = guidance_mode
+        self.guidance_latency = {'two_call': deque(maxlen=500), 'single_shot': deque(maxlen=500)}
+
+    def warm_up(self):
+        """Run one depth inference (locally or on the depth server) so the first real scan isn't slow"""
+        self.depth.warm_up()
+
+    # Returns (frame_hash, cached value) for a session, or (None, None) when caching doesn't apply
+    def __cache_lookup(self, session_id, kind: str, image_bytes: bytes):
+        if session_id is None or not self.frame_cache.enabled:
+            return None, None
+        frame_hash = run_offloaded(self.offload, dhash_bytes, image_bytes)
+        return frame_hash, self.frame_cache.lookup(session_id, kind, frame_hash)
+
+    def guidance_stats(self) -> dict:
+        """End-to-end guidance latency per mode over the most recent scans"""
+        stats = {}
+        for mode, latencies in self.guidance_latency.items():
+            samples = np.array(latencies)
+            stats[mode] = {
+                'count': len(samples),
+                'mean': float(samples.mean()) if len(samples) else 0.0,
+                'p50': float(np.percentile(samples, 50)) if len(samples) else 0.0,
+                'p95': float(np.percentile(samples, 95)) if len(samples) else 0.0,
+            }
+        return stats
+
+    def depth_stats(self) -> dict:
+        """Batch occupancy stats for the shared depth inference worker, plus temporal reuse when enabled"""
+        return self.depth.stats()
+
+    def drop_session(self, session_id):
+        """Forget a disconnected session's cached frames and depth keyframe"""
+        self.frame_cache.drop(session_id)
+        self.depth.drop(session_id)
+
+    # Decodes JPEG/PNG bytes straight into a BGR ndarray without touching disk
+    @staticmethod
+    def decode_image(image_bytes: bytes) -> np.ndarray:
+        img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("Could not decode image data")
+        return img
+
+    # Decodes (unless already decoded) and resizes to the 600x600 working resolution
+    @staticmethod
+    def prepare_image(image_bytes: bytes, img: np.ndarray = None) -> np.ndarray:
+        if img is None:
+            img = YeongSil.decode_image(image_bytes)
+        return cv2.resize(img, (600, 600))
+
+    # Takes some encoded image and returns a description of the image from gemini and angle buckets of average depth.
+    # The JPEG is decoded once for MiDaS and the original bytes are reused as-is for the Gemini upload.
+    # The description request is sent to the thread pool first so the network round-trip overlaps
+    # with depth estimation and bucketing, which run locally on this thread.
+    def __process_image(self, image_bytes: bytes, img: np.ndarray = None, session_id=None) -> tuple[str, list[float]]:
+        wall_start = time.perf_counter()
+
+        # Gemini image description (runs concurrently with the local depth pipeline)
+        desc_future = self.executor.submit(self.__timed, tracer.wrap('description', self.__describe_image), image_bytes)
+
         # Load and prepare image
-        step_start = time.time()
-        img = cv2.imread(image_path)
-        # Resize image to 600x600 for faster processing
-        img = cv2.resize(img, (600, 600))
-        
+        with tracer.span('decode'):
+            step_start = time.perf_counter()
+            # Resize image to 600x600 for faster processing
+            img = run_offloaded(self.offload, self.prepare_image, image_bytes, img)
+            decode_time = time.perf_counter() - step_start
+
+        with tracer.span('depth'):
+            depth_buckets, depth_time = self.__timed(self.__get_depth_buckets, img, session_id)
+
+        # Join the description request
+        with tracer.span('description_wait'):
+            desc, desc_time = desc_future.result()
+
+        # Time the overlap saved compared with running decode, depth and description one after another
+        total_time = time.perf_counter() - wall_start
+        tracer.observe('overlap_saved', max(0.0, decode_time + depth_time + desc_time - total_time))
+        return desc, depth_buckets
+
+    # Runs fn and returns (result, elapsed seconds)
+    @staticmethod
+    def __timed(fn, *args):
+        step_start = time.perf_counter()
+        result = fn(*args)
+        return result, time.perf_counter() - step_start
+
+    # Sends a request to Gemini unless a byte-identical (model, parts) request is in the response cache.
+    # Parts are prompt strings or raw JPEG bytes.
+    def __generate(self, parts: list, model: str = 'gemini-2.5-flash') -> str:
+        key = response_key(model, parts)
+        text = self.response_cache.get(key)
+        if text is not None:
+            return text
+
+        tracer.count('gemini_requests')
+        with tracer.span('gemini'):
+            text = self.gemini.models.generate_content(model=model, contents=self.__contents(parts)).text
+        if text:
+            self.response_cache.put(key, text)
+        return text
+
+    # Streaming variant of __generate: yields text pieces as Gemini produces them
+    def __generate_stream(self, parts: list, model: str = 'gemini-2.5-flash'):
+        key = response_key(model, parts)
+        text = self.response_cache.get(key)
+        if text is not None:
+            yield text
+            return
+
+        tracer.count('gemini_requests')
+        pieces = []
+        for chunk in self.gemini.models.generate_content_stream(model=model, contents=self.__contents(parts)):
+            if chunk.text:
+                pieces.append(chunk.text)
+                yield chunk.text
+        text = ''.join(pieces)
+        if text:
+            self.response_cache.put(key, text)
+
+    @staticmethod
+    def __contents(parts: list) -> list:
+        return [
+            types.Part.from_bytes(data=part, mime_type='image/jpeg') if isinstance(part, bytes) else part
+            for part in parts
+        ]
+
+    # Asks Gemini for a short positional description of the image
+    def __describe_image(self, image_bytes: bytes) -> str:
+        return self.__generate([
+            image_bytes,
+            'Describe what is in the image, including positions of large/major objects (far left, left, middle, right, far right), referring to it as "your view" in 2 sentences.'
+        ])
+
+    # Average depth for each 10 degree angle bucket of a 600x600 BGR image, from the local pipeline
+    # or the depth server
+    def __get_depth_buckets(self, img: np.ndarray, session_id=None, reuse: bool = False) -> list[float]:
+        if self.remote_depth:
+            with tracer.span('depth_remote'):
+                return self.depth.depth_buckets(img, session_id, reuse)
+        return self.depth.depth_buckets(img, session_id, reuse)
+
+    def get_guidance(self, image_path: str):
         with open(image_path, 'rb') as f:
             image_bytes = f.read()
-        print(f"[{time.time() - start_time:.1f}s] Image loaded from disk")
-
-        # Resize image for depth processing (smaller size for faster processing)
-        img_small = cv2.resize(img, (256, 256))  # Smaller size for depth processing
-        img_small = cv2.cvtColor(img_small, cv2.COLOR_BGR2RGB)
-        input_batch = self.transform(img_small).to(device)
-        print(f"[{time.time() - start_time:.1f}s] Image preprocessed and transformed")
-        
-        # Depth estimation
-        step_start = time.time()
-        with torch.no_grad():
-            prediction = self.midas(input_batch)
-
-            prediction = torch.nn.functional.interpolate(
-                prediction.unsqueeze(1),
-                size=img.shape[:2],
-                mode="bicubic",
-                align_corners=False,
-            ).squeeze()
-        print(f"[{time.time() - start_time:.1f}s] Depth estimation completed")
-
-        output = prediction.cpu().numpy()
-        print(f"[{time.time() - start_time:.1f}s] Depth data moved to CPU")
-
-        h, w = output.shape
-
-        # Vectorized coordinate generation (much faster)
-        step_start = time.time()
-        x_coords = np.flip(np.tile(np.arange(w), h)) / 40
-        x_coords = x_coords - x_coords.mean()
-        y_coords = -np.flip(output.flatten()) / 80 + 35
-        z_coords = np.repeat(np.arange(h), w) / 40
-
-        xyz = np.column_stack((x_coords, y_coords, z_coords))
-        print(f"[{time.time() - start_time:.1f}s] 3D coordinates generated")
-
-        # Commented out 3D visualization to prevent GUI crashes in background processing
-        # pts = Points(xyz, r=4)  # r is point radius
-        # pts.cmap("viridis", xyz[:, 1])  # color by y-values (you can change this)
-        # show(pts, axes=1, bg='white', title='3D Point Cloud')
-
-        # Gemini image description
-        step_start = time.time()
-        desc = self.gemini.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=[
-                types.Part.from_bytes(
-                    data      = image_bytes,
-                    mime_type = 'image/jpeg',
-                ),
-                'Describe what is in the image, including positions of large/major objects (far left, left, middle, right, far right), referring to it as "your view" in 2 sentences.'
-            ]
-        )
-        print(f"[{time.time() - start_time:.1f}s] Gemini image description completed")
-
-        # Vectorized angle bucket calculation (much faster)
-        step_start = time.time()
-        angles = np.degrees(np.arctan2(x_coords, y_coords))
-        
-        # Use digitize for faster bucketing
-        bucket_edges = np.arange(-90, 91, 10)
-        bucket_indices = np.digitize(angles, bucket_edges) - 1
-        
-        # Ensure indices are within valid range
-        bucket_indices = np.clip(bucket_indices, 0, len(bucket_edges) - 2)
-        
-        # Vectorized average calculation for each bucket
-        depth_buckets = []
-        for i in range(len(bucket_edges) - 1):
-            mask = bucket_indices == i
-            if np.any(mask):
-                depth_buckets.append(np.mean(y_coords[mask]))
-            else:
-                depth_buckets.append(0.0)
-        print(f"[{time.time() - start_time:.1f}s] Depth buckets calculated")
-
-        print(f"[{time.time() - start_time:.1f}s] YeongSil processing completed successfully")
-        return desc.text, depth_buckets
-
-    
-    def get_guidance(self, image_path: str):
-        start_time = time.time()
-        print(f"[{0:.1f}s] Starting YeongSil guidance generation...")
-        
-        desc, depth_buckets = self.__process_image(image_path)
-        print(f"[{time.time() - start_time:.1f}s] Image processing completed, generating guidance...")
-
-        depth_desc = '\n'.join([f'{dist} degrees: {depth_buckets[i]:.2f} units of space' for i, dist in enumerate(range(-85, 85, 10))])
-
-        guidance = self.gemini.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=[
-                f'Please advise the blind user on how to traverse the following environment: {desc}.',
-                f'The depth values are from 0-180 degrees, and how many units forward there, where 90 degrees is directly forward, but refer to them as 0-90 degrees right or left: {depth_desc}.',
-                'Please advise in 1-2 sentences of 2 clauses max with environmental context, with instructions including angle of travel first.'
-            ]
-        )
-        print(f"[{time.time() - start_time:.1f}s] Navigation guidance generated successfully")
-
-        return guidance.text, depth_buckets
+        return self.get_guidance_from_bytes(image_bytes)
+
+    def get_guidance_from_bytes(self, image_bytes: bytes, img: np.ndarray = None, session_id=None, mode: str = None):
+        """Navigation guidance for an encoded frame held in memory (no temp files)"""
+        with tracer.span('guidance'):
+            wall_start = time.perf_counter()
+
+            frame_hash, cached = self.__cache_lookup(session_id, 'guidance', image_bytes)
+            if cached is not None:
+                tracer.count('frame_cache_hits')
+                return cached
+
+            mode = self.__resolve_mode(mode)
+            parts, depth_buckets = self.__guidance_request(image_bytes, img, mode, session_id)
+
+            with tracer.span(f'guidance_{mode}'):
+                guidance = self.__generate(parts)
+            self.guidance_latency[mode].append(time.perf_counter() - wall_start)
+
+            if frame_hash is not None:
+                self.frame_cache.store(session_id, 'guidance', frame_hash, (guidance, depth_buckets))
+            return guidance, depth_buckets
+
+    def __resolve_mode(self, mode: str = None) -> str:
+        mode = mode or self.guidance_mode
+        if mode == 'ab':
+            mode = random.choice(('two_call', 'single_shot'))
+        return mode
+
+    # Returns the prompt parts for the final guidance request plus the depth buckets.
+    # two_call: description (overlapped with depth) first, then a text-only guidance request.
+    # single_shot: depth buckets are computed locally first, then image + depth table + instructions
+    # go out in a single multimodal request, saving the separate description round-trip.
+    def __guidance_request(self, image_bytes: bytes, img: np.ndarray, mode: str, session_id=None) -> tuple[list, list[float]]:
+        if mode == 'single_shot':
+            img = run_offloaded(self.offload, self.prepare_image, image_bytes, img)
+            depth_buckets = self.__get_depth_buckets(img, session_id)
+            return guidance_parts(depth_buckets, image_bytes=image_bytes), depth_buckets
+
+        desc, depth_buckets = self.__process_image(image_bytes, img, session_id)
+        return guidance_parts(depth_buckets, description=desc), depth_buckets
+
+    def stream_guidance_from_bytes(self, image_bytes: bytes, img: np.ndarray = None, session_id=None, mode: str = None):
+        """Like get_guidance_from_bytes, but returns (depth_buckets, chunks) where chunks yields the
+        guidance in sentence/clause sized pieces as Gemini streams it, so speech can start early"""
+        wall_start = time.perf_counter()
+        with tracer.span('guidance_stream_setup'):
+            frame_hash, cached = self.__cache_lookup(session_id, 'guidance', image_bytes)
+            if cached is not None:
+                tracer.count('frame_cache_hits')
+                return cached[1], speech_chunks([cached[0]])
+
+            mode = self.__resolve_mode(mode)
+            parts, depth_buckets = self.__guidance_request(image_bytes, img, mode, session_id)
+
+        # The generator outlives the span, so its latencies are recorded directly
+        def chunks():
+            spoken = []
+            for chunk in speech_chunks(self.__generate_stream(parts)):
+                if not spoken:
+                    tracer.observe('guidance_first_chunk', time.perf_counter() - wall_start)
+                spoken.append(chunk)
+                yield chunk
+            self.guidance_latency[mode].append(time.perf_counter() - wall_start)
+            tracer.observe(f'guidance_stream_{mode}', time.perf_counter() - wall_start)
+            if frame_hash is not None:
+                self.frame_cache.store(session_id, 'guidance', frame_hash, (' '.join(spoken), depth_buckets))
+
+        return depth_buckets, chunks()
+
+    def get_depth_buckets_from_bytes(self, image_bytes: bytes, img: np.ndarray = None, session_id=None) -> list[float]:
+        """Depth buckets only (local MiDaS, no Gemini calls), for continuous obstacle monitoring.
+        These are the only requests that may reuse a warped keyframe (see temporal_depth)"""
+        with tracer.span('depth_only'):
+            img = run_offloaded(self.offload, self.prepare_image, image_bytes, img)
+            return self.__get_depth_buckets(img, session_id, True)
 
     def get_text_from_image(self, image_path: str):
         """Extract text from an image using Gemini Vision API"""
-        start_time = time.time()
-        print(f"[{0:.1f}s] Starting text extraction from image...")
-        
-        # Load image bytes
         with open(image_path, 'rb') as f:
             image_bytes = f.read()
-        print(f"[{time.time() - start_time:.1f}s] Image loaded for text extraction")
-        
-        # Extract text using Gemini
-        text_result = self.gemini.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=[
-                types.Part.from_bytes(
-                    data=image_bytes,
-                    mime_type='image/jpeg',
-                ),
+        return self.get_text_from_bytes(image_bytes)
+
+    def get_text_from_bytes(self, image_bytes: bytes, session_id=None):
+        """Extract text from an encoded image held in memory"""
+        with tracer.span('read'):
+            frame_hash, cached = self.__cache_lookup(session_id, 'text', image_bytes)
+            if cached is not None:
+                tracer.count('frame_cache_hits')
+                return cached
+            
+            # Extract text using Gemini
+            extracted_text = self.__generate([
+                image_bytes,
                 'Extract and read all text visible in this image. If there is text, provide it exactly as it appears. If there is no text, say "No text found in the image."'
-            ]
-        )
-        
-        extracted_text = text_result.text
-        print(f"[{time.time() - start_time:.1f}s] Text extraction completed")
-        print(f"[{time.time() - start_time:.1f}s] Extracted text: {extracted_text[:100]}...")
-        
-        return extracted_text
\ No newline at end of file
+            ])
+
+            if frame_hash is not None:
+                self.frame_cache.store(session_id, 'text', frame_hash, extracted_text)
+            return extracted_text
+
+
+class RemoteYeongSil(YeongSil):
+    """YeongSil for lightweight web workers: the same get_guidance/get_guidance_from_bytes/
+    stream_guidance_from_bytes/get_text_from_bytes interface, with depth served by a shared
+    depth_server.py process instead of a MiDaS copy in this process"""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, connections: int = 4, **kwargs):
+        super().__init__(depth_client=DepthClient(address, connections), **kwargs)
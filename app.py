@@ -1,42 +1,145 @@
 import os
+
+# Production serving (YEONGSIL_SERVER_MODE=async): eventlet green threads for sockets and network calls,
+# CPU-bound work on eventlet's native thread pool. Patching has to happen before anything else is imported.
+async_serving = os.environ.get('YEONGSIL_SERVER_MODE', 'dev') == 'async'
+cpu_threads = int(os.environ.get('YEONGSIL_CPU_THREADS', 4))
+if async_serving:
+    import eventlet
+    eventlet.monkey_patch()
+    from eventlet import tpool
+    tpool.set_num_threads(cpu_threads)
+
 import base64
 import io
-import tempfile
 import threading
 import time
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_socketio import SocketIO, emit, disconnect
 import speech_recognition as sr
 from werkzeug.utils import secure_filename
 import cv2
 import numpy as np
-from YeongSil import YeongSil
+from YeongSil import RemoteYeongSil, YeongSil
+from depth_server import DepthServerError
+from response_cache import ResponseCache
+from sessions import Frame, SessionRegistry
+from audio_pipeline import AudioDecodeError, AudioDecoder
+from flow_control import FlowController
+from obstacle_monitor import MonitorState, ObstacleMonitor
+from asr_backends import AsrUnavailable, create_asr_backend, match_command
+from tracing import tracer
+from scheduler import JobScheduler, QueueFull, PRIORITY_SCAN, PRIORITY_READ, PRIORITY_MONITOR
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'yeongsil_navigation_secret'
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Dev mode pins plain threads: scheduler workers are OS threads that emit results, which eventlet
+# (auto-selected because it is installed) does not support without monkey patching
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet' if async_serving else 'threading')
 
 # Global state
-latest_frame = None
-is_listening = False
 yeongsil_ai = None
-processing_queue = []
-max_queue_size = 3  # Limit processing queue for performance
-audio_processing_lock = threading.Lock()  # Prevent concurrent audio processing
-last_processed_audio = 0  # Timestamp of last processed audio to prevent duplicate processing
+# Per-client state (frame slot, listening flag, speech buffer, stats) keyed by Socket.IO sid
+sessions = SessionRegistry(
+    max_sessions=int(os.environ.get('YEONGSIL_MAX_SESSIONS', 64)),
+    max_frame_bytes=int(os.environ.get('YEONGSIL_MAX_FRAME_MB', 64)) * 1024 * 1024,
+)
+# Bounded worker pool for scans/reads: priority lanes, per-session coalescing, cancellation on disconnect
+scheduler = JobScheduler(
+    workers=int(os.environ.get('YEONGSIL_WORKERS', 2)),
+    max_queue=int(os.environ.get('YEONGSIL_MAX_QUEUE', 32)),
+    max_per_session=3,  # one scan, one read and one obstacle check
+)
+# Per-session capture cadence/quality advertised to clients from queue depth and job latency
+flow = FlowController(
+    workers=int(os.environ.get('YEONGSIL_WORKERS', 2)),
+    target_latency=float(os.environ.get('YEONGSIL_TARGET_LATENCY', 4.0)),
+)
+# Local depth-only obstacle checks on incoming frames (no Gemini), rate limited per session
+obstacle_monitor = ObstacleMonitor(
+    rate=float(os.environ.get('YEONGSIL_MONITOR_HZ', 1.0)),
+    threshold=float(os.environ.get('YEONGSIL_OBSTACLE_THRESHOLD', 25.0)),
+)
+stream_guidance = os.environ.get('YEONGSIL_STREAM_GUIDANCE', '1') != '0'  # Send scan guidance as it streams in
+
+# Per-frame/per-chunk logs and per-request span lines; metrics are collected either way
+log_frames = os.environ.get('YEONGSIL_LOG_FRAMES', '1') != '0'
+dev_debug = os.environ.get('YEONGSIL_DEBUG', '1') != '0'  # Flask debug + reloader in dev mode (the reloader's parent loads MiDaS too)
+tracer.log_spans = log_frames
+
+yeongsil_state = 'warming'  # warming -> ready | failed
+
+def run_cpu(fn, *args):
+    """Run CPU-bound work (decode, VAD, local ASR, MiDaS) without stalling the event loop in async mode"""
+    return tpool.execute(fn, *args) if async_serving else fn(*args)
+
+def connect_remote_yeongsil(address: str, retry_interval: float = 2.0, **options) -> RemoteYeongSil:
+    """RemoteYeongSil once the depth server accepts connections; waits (state stays 'warming') while it
+    is not up yet, so web workers and the depth server can be started in any order"""
+    connections = int(os.environ.get('YEONGSIL_DEPTH_CONNECTIONS', 4))
+    waiting = False
+    while True:
+        try:
+            return RemoteYeongSil(address, connections=connections, **options)
+        except DepthServerError as e:
+            if not waiting:
+                print(f"⏳ Waiting for the depth server: {e}")
+                waiting = True
+            time.sleep(retry_interval)
+
+def initialize_yeongsil():
+    """Load models and run a warm-up inference in the background so the server can start serving immediately"""
+    global yeongsil_ai, yeongsil_state
+    try:
+        gemini_client = None
+        if os.environ.get('YEONGSIL_STUB_GEMINI_LATENCY'):
+            # Offline load tests: canned Gemini replies after a fixed delay
+            from offline_stubs import StubGeminiClient
+            gemini_client = StubGeminiClient(latency=float(os.environ['YEONGSIL_STUB_GEMINI_LATENCY']))
+        options = dict(
+            guidance_mode=os.environ.get('YEONGSIL_GUIDANCE_MODE', 'two_call'),
+            response_cache=ResponseCache(persist_dir=os.environ.get('YEONGSIL_RESPONSE_CACHE_DIR')),
+            gemini_client=gemini_client,
+            offload=run_cpu if async_serving else None,
+        )
+        if os.environ.get('YEONGSIL_DEPTH_SERVER'):
+            # Depth comes from a shared depth_server.py process; this worker loads no model
+            ai = connect_remote_yeongsil(os.environ['YEONGSIL_DEPTH_SERVER'], **options)
+        else:
+            ai = YeongSil(
+                depth_backend=os.environ.get('YEONGSIL_DEPTH_BACKEND', 'torch'),
+                temporal_depth=os.environ.get('YEONGSIL_TEMPORAL_DEPTH', '1') != '0',  # reused for obstacle checks only
+                **options,
+            )
+        ai.warm_up()
+        yeongsil_ai = ai
+        yeongsil_state = 'ready'
+        print("✅ YeongSil AI initialized successfully")
+    except Exception as e:
+        print(f"❌ Failed to initialize YeongSil AI: {e}")
+        yeongsil_ai = None
+        yeongsil_state = 'failed'
 
 # Initialize YeongSil AI
-try:
-    yeongsil_ai = YeongSil()
-    print("✅ YeongSil AI initialized successfully")
-except Exception as e:
-    print(f"❌ Failed to initialize YeongSil AI: {e}")
-    yeongsil_ai = None
+threading.Thread(target=initialize_yeongsil, name='yeongsil-init', daemon=True).start()
 
 # Initialize speech recognition
 recognizer = sr.Recognizer()
-print("🎤 Speech recognition initialized")
+# Configure recognizer for better accuracy
+recognizer.energy_threshold = 300
+recognizer.dynamic_energy_threshold = True
+recognizer.pause_threshold = 0.8
+asr_backend = create_asr_backend(os.environ.get('YEONGSIL_ASR', 'google'), recognizer)
+audio_decoder = AudioDecoder()
+speech_counts = {'chunks': 0, 'gated_chunks': 0, 'utterances': 0}  # only endpointed utterances reach the ASR backend
+print(f"🎤 Speech recognition initialized ({asr_backend.name})")
+
+def decode_data_url(data_url):
+    """Decode a base64 data URL (or bare base64 string) into raw image bytes"""
+    if ',' in data_url:
+        data_url = data_url.split(',', 1)[1]
+    return base64.b64decode(data_url)
 
 @app.route('/')
 def index():
@@ -49,9 +152,52 @@ def health():
     return jsonify({
         'status': 'healthy',
         'yeongsil_ready': yeongsil_ai is not None,
-        'listening': is_listening
+        'yeongsil_state': yeongsil_state,
+        'listening': sessions.any_listening(),
+        'sessions': sessions.stats(),
+        'scheduler': scheduler.stats(),
+        'flow_control': flow.stats(),
+        'obstacle_monitor': obstacle_monitor.stats(),
+        'audio_decoder': audio_decoder.stats(),
+        'speech': speech_counts,
+        'depth_batching': depth_health() if yeongsil_ai else None,
+        'frame_cache': yeongsil_ai.frame_cache.stats() if yeongsil_ai else None,
+        'response_cache': yeongsil_ai.response_cache.stats() if yeongsil_ai else None,
+        'guidance_latency': yeongsil_ai.guidance_stats() if yeongsil_ai else None
     })
 
+def depth_health():
+    """Depth pipeline stats; a depth server that is down is reported here rather than failing /health"""
+    try:
+        return yeongsil_ai.depth_stats()
+    except DepthServerError as e:
+        return {'error': str(e)}
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics: stage latency histograms, queue depth, cache hits, Gemini/ASR call counts"""
+    scheduler_stats = scheduler.stats()
+    gauges = {
+        'sessions_active': len(sessions),
+        'queue_depth': scheduler_stats['lanes'],
+        'jobs_running': scheduler_stats['running'],
+        'yeongsil_ready': yeongsil_ai is not None,
+    }
+    counters = {
+        'jobs': {name: scheduler_stats[name] for name in ('completed', 'failed', 'rejected', 'coalesced', 'cancelled')},
+        'audio_chunks': speech_counts['chunks'],
+        'gated_audio_chunks': speech_counts['gated_chunks'],
+        'utterances': speech_counts['utterances'],
+        'audio_decodes': {method: count for method, count in audio_decoder.stats().items() if isinstance(count, int)},
+    }
+    if yeongsil_ai:
+        response_cache_stats = yeongsil_ai.response_cache.stats()
+        frame_cache_stats = yeongsil_ai.frame_cache.stats()
+        counters['response_cache'] = {name: response_cache_stats[name] for name in ('hits', 'disk_hits', 'misses')}
+        counters['frame_cache'] = {name: frame_cache_stats[name] for name in ('hits', 'misses')}
+        gauges['response_cache_entries'] = response_cache_stats['entries']
+    return Response(tracer.render_prometheus(gauges, counters), mimetype='text/plain; version=0.0.4')
+
 @app.route('/process_frame', methods=['POST'])
 def process_frame():
     """Process a single frame with YeongSil AI"""
@@ -61,16 +207,12 @@ def process_frame():
             return jsonify({'error': 'No image data provided'}), 400
         
         # Decode base64 image
-        image_data = base64.b64decode(data['image'].split(',')[1])
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-            tmp_file.write(image_data)
-            tmp_path = tmp_file.name
+        image_data = decode_data_url(data['image'])
         
         if yeongsil_ai:
-            guidance, depth_buckets = yeongsil_ai.get_guidance(tmp_path)
-            os.unlink(tmp_path)  # Clean up temp file
+            # No session for REST callers: their address is shared behind NAT and never disconnects,
+            # so it must not key the per-session frame cache or depth keyframes
+            guidance, depth_buckets = yeongsil_ai.get_guidance_from_bytes(image_data)
             
             # Convert numpy float32 to regular Python floats for JSON serialization
             depth_buckets_serializable = [float(bucket) for bucket in depth_buckets]
@@ -79,8 +221,9 @@ def process_frame():
                 'guidance': guidance,
                 'depth_buckets': depth_buckets_serializable
             })
+        elif yeongsil_state == 'warming':
+            return jsonify({'error': 'YeongSil AI is still warming up'}), 503
         else:
-            os.unlink(tmp_path)
             return jsonify({'error': 'YeongSil AI not available'}), 500
             
     except Exception as e:
@@ -89,257 +232,256 @@ def process_frame():
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
-    print("📱 Client connected")
+    session = sessions.get(request.sid)
+    print(f"📱 Client connected ({len(sessions)} active)")
     emit('status', {'message': 'Connected to YeongSil Navigation Assistant'})
+    advertise_flow(session)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
-    global is_listening
-    print("📱 Client disconnected")
-    is_listening = False
+    sessions.remove(request.sid)
+    scheduler.cancel_session(request.sid)
+    print(f"📱 Client disconnected ({len(sessions)} active)")
+    if yeongsil_ai:
+        yeongsil_ai.drop_session(request.sid)
 
 @socketio.on('start_continuous_mode')
 def handle_start_continuous():
     """Start continuous listening mode"""
-    global is_listening
+    session = sessions.get(request.sid)
     
-    if not is_listening:
-        is_listening = True
+    if not session.is_listening:
+        session.is_listening = True
         print("🎤 Starting continuous voice recognition...")
         print("📱 Using WebSocket-based audio processing (more reliable)")
         
         emit('status', {'message': 'Voice recognition active - say "scan surroundings"'})
+        advertise_flow(session)
 
 @socketio.on('stop_continuous_mode')
 def handle_stop_continuous():
     """Stop continuous listening mode"""
-    global is_listening
-    is_listening = False
+    session = sessions.get(request.sid)
+    session.is_listening = False
+    with session.audio_lock:
+        session.speech_buffer.reset()
     print("🎤 Stopped continuous voice recognition")
     emit('status', {'message': 'Voice recognition stopped'})
+    advertise_flow(session)
+
+@socketio.on('start_obstacle_monitor')
+def handle_start_obstacle_monitor():
+    """Start continuous local obstacle alerts for this client"""
+    session = sessions.get(request.sid)
+    if session.monitor is None:
+        session.monitor = MonitorState()
+        print("🚧 Obstacle monitoring started")
+    advertise_flow(session)
+
+@socketio.on('stop_obstacle_monitor')
+def handle_stop_obstacle_monitor():
+    """Stop continuous local obstacle alerts for this client"""
+    session = sessions.get(request.sid)
+    session.monitor = None
+    print("🚧 Obstacle monitoring stopped")
+    advertise_flow(session)
+
+@socketio.on('frame')
+def handle_frame(data):
+    """Handle a camera frame sent as raw JPEG bytes (binary attachment, no base64)"""
+    try:
+        store_frame(sessions.get(request.sid), bytes(data))
+    except Exception as e:
+        print(f"❌ Error handling frame: {e}")
 
 @socketio.on('frame_data')
 def handle_frame_data(data):
-    """Handle camera frame data"""
-    global latest_frame
-    
+    """Handle camera frame data sent as a base64 data URL (older clients)"""
     try:
-        # Store the latest frame for voice command processing
-        latest_frame = data.get('frame')
-        print("📸 Frame received and stored")
+        store_frame(sessions.get(request.sid), decode_data_url(data.get('frame')))
     except Exception as e:
         print(f"❌ Error handling frame data: {e}")
 
+def store_frame(session, jpeg):
+    """Store the latest frame for voice command processing; it is only decoded if a scan uses it"""
+    # Clients that ignore the advertised interval are thinned out here
+    previous, advertised = session.latest_frame, session.flow.get('advertised')
+    if previous is not None and advertised is not None:
+        if time.time() - previous.received_at < advertised['frame_interval_ms'] / 2000:
+            session.stats['frames_dropped'] += 1
+            return
+    sessions.set_frame(session, Frame(jpeg))
+    session.stats['frames'] += 1
+    tracer.count('frames')
+    if log_frames:
+        print("📸 Frame received and stored")
+    advertise_flow(session)
+    
+    if session.monitor is not None and yeongsil_ai and obstacle_monitor.due(session.monitor):
+        try:
+            scheduler.submit(session.sid, 'monitor', lambda job: process_obstacle_check(session, job), PRIORITY_MONITOR)
+        except QueueFull:
+            pass  # background check, the next frame will try again
+
+def advertise_flow(session):
+    """Send the session new capture settings when load moved its flow-control level"""
+    # Obstacle monitoring asks for more frames, within what the session's load level allows
+    monitor_interval = int(1000 * obstacle_monitor.interval) if session.monitor is not None else None
+    settings = flow.update(session.flow, session.is_listening, scheduler.queue_depth(), scheduler.recent_latency(),
+                           monitor_interval)
+    if settings is not None:
+        print(f"📶 Flow control for {session.sid}: {settings}")
+        emit_to(session, 'flow_control', settings)
+
 @socketio.on('audio_data')
 def handle_audio_data(data):
-    """Handle audio data for voice recognition with deduplication"""
-    global last_processed_audio
-    
+    """Handle audio data for voice recognition, stitching overlapping chunks into one stream"""
+    session = sessions.get(request.sid)
+    if async_serving:
+        # Return to the event loop at once; results are emitted to the session's sid when ready
+        socketio.start_background_task(process_audio_chunk, session, data)
+    else:
+        process_audio_chunk(session, data)
+
+@tracer.traced('audio_chunk')
+def process_audio_chunk(session, data):
+    """Decode one chunk, feed the session's speech buffer and recognize every completed utterance"""
     try:
-        current_time = time.time()
-        
-        # Prevent processing too many audio chunks in quick succession
-        # This helps with the overlapping audio chunks
-        if current_time - last_processed_audio < 0.5:  # 500ms minimum between processing
-            print(f"🎤 Skipping audio chunk (too recent): {current_time - last_processed_audio:.2f}s ago")
-            return
-        
-        with audio_processing_lock:
+        with session.audio_lock:
+            session.stats['audio_chunks'] += 1
+            speech_counts['chunks'] += 1
             # Decode base64 audio
             audio_data = base64.b64decode(data['audio'])
             audio_format = data.get('format', 'audio/webm')
             
-            print(f"🎤 Processing audio data: {len(audio_data)} bytes, format: {audio_format}")
-            
-            # Determine file extension based on format
-            if 'webm' in audio_format:
-                suffix = '.webm'
-            elif 'mp4' in audio_format:
-                suffix = '.mp4'
-            elif 'wav' in audio_format:
-                suffix = '.wav'
-            else:
-                suffix = '.webm'  # Default fallback
-            
-            # Save audio file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as audio_file:
-                audio_file.write(audio_data)
-                audio_path = audio_file.name
+            if log_frames:
+                print(f"🎤 Processing audio data: {len(audio_data)} bytes, format: {audio_format}")
             
-            # Process based on format
-            if suffix == '.wav':
-                # Direct processing for WAV
-                process_voice_command(audio_path)
-            else:
-                # Convert other formats to WAV
+            # Decode to 16 kHz mono PCM in memory (no temp files or per-chunk WAV round-trips).
+            # Only the lock-free conversion is offloaded; the decoder's stats lock is taken here
+            with tracer.span('audio_decode'):
                 try:
-                    # Try ffmpeg conversion first
-                    wav_path = audio_path.replace(suffix, '.wav')
-                    import subprocess
-                    result = subprocess.run([
-                        'ffmpeg', '-i', audio_path, '-acodec', 'pcm_s16le', 
-                        '-ar', '16000', '-ac', '1', wav_path, '-y'
-                    ], capture_output=True, timeout=3)  # Reduced timeout for faster processing
-                    
-                    if result.returncode == 0:
-                        process_voice_command(wav_path)
-                        os.unlink(wav_path)
-                    else:
-                        # Fallback: try pydub conversion
-                        process_voice_command_webm(audio_path)
-                        
-                except (subprocess.TimeoutExpired, FileNotFoundError):
-                    # Fallback: try pydub conversion
-                    process_voice_command_webm(audio_path)
+                    method, pcm, decode_time = run_cpu(audio_decoder.convert, audio_data, audio_format)
+                except AudioDecodeError:
+                    audio_decoder.record('failed')
+                    raise
+                audio_decoder.record(method, decode_time)
             
-            # Clean up
-            if os.path.exists(audio_path):
-                os.unlink(audio_path)
-            
-            # Update last processed timestamp
-            last_processed_audio = current_time
+            # Append only the audio we have not seen yet; recognize each utterance once, after it ends
+            with tracer.span('speech_buffer'):
+                gated = session.vad.gated
+                utterances = run_cpu(session.speech_buffer.feed, pcm, data.get('start_ms'))
+                speech_counts['gated_chunks'] += session.vad.gated - gated
+            for utterance in utterances:
+                speech_counts['utterances'] += 1
+                process_voice_command(audio_decoder.to_audio_data(utterance), session)
         
     except Exception as e:
         print(f"❌ Error processing audio: {e}")
-        emit('voice_processing_error', {'error': str(e)})
+        emit_to(session, 'voice_processing_error', {'error': str(e)})
 
-def process_voice_command(audio_path):
-    """Process voice command from audio file"""
+def process_voice_command(audio, session):
+    """Process voice command from decoded audio (sr.AudioData)"""
     try:
         print("🎤 Processing voice command...")
         
-        # Use speech recognition
-        with sr.AudioFile(audio_path) as source:
-            audio = recognizer.record(source)
-        
-        # Try Google Speech Recognition with improved settings
+        # Recognize with the configured ASR backend (google, offline vosk/sphinx, or a chain of them)
         try:
-            # Configure recognizer for better accuracy
-            recognizer.energy_threshold = 300
-            recognizer.dynamic_energy_threshold = True
-            recognizer.pause_threshold = 0.8
-            
-            text = recognizer.recognize_google(audio, language='en-US').lower()
-            print(f"🎤 Recognized: '{text}'")
+            tracer.count(f'asr_requests_{asr_backend.name}')
+            with tracer.span('asr'):
+                # Cloud recognizers just wait on the (green) socket; local ones are CPU work
+                text = run_cpu(asr_backend.transcribe, audio) if asr_backend.local else asr_backend.transcribe(audio)
+            if text is None:
+                raise sr.UnknownValueError()
+            print(f"🎤 Recognized ({asr_backend.name}): '{text}'")
+            command = match_command(text)
             
             # Check for "scan surroundings" command (more flexible matching)
-            if any(phrase in text for phrase in ["scan surroundings", "scan", "scanning"]):
+            if command == 'scan':
                 print("✅ Voice command detected: scan surroundings")
-                emit('voice_command_detected', {'command': text})
+                emit_to(session, 'voice_command_detected', {'command': text})
                 
                 # Process latest frame if available
-                if latest_frame and yeongsil_ai:
-                    process_immediate_scan()
+                if session.latest_frame and yeongsil_ai:
+                    schedule_job(session, 'scan', process_immediate_scan, PRIORITY_SCAN)
                 else:
-                    emit('voice_analysis_error', {'error': 'No frame available or YeongSil not ready'})
+                    emit_to(session, 'voice_analysis_error', {'error': 'No frame available or YeongSil not ready'})
             # Check for "read" command (more flexible matching)
-            elif any(phrase in text for phrase in ["read", "reading", "read this", "read that"]):
+            elif command == 'read':
                 print("✅ Voice command detected: read text")
-                emit('voice_command_detected', {'command': text})
+                emit_to(session, 'voice_command_detected', {'command': text})
                 
                 # Process latest frame for text extraction if available
-                if latest_frame and yeongsil_ai:
-                    process_text_extraction()
+                if session.latest_frame and yeongsil_ai:
+                    schedule_job(session, 'read', process_text_extraction, PRIORITY_READ)
                 else:
-                    emit('voice_analysis_error', {'error': 'No frame available or YeongSil not ready'})
+                    emit_to(session, 'voice_analysis_error', {'error': 'No frame available or YeongSil not ready'})
             else:
                 # Only emit voice_detected for longer phrases to reduce noise
                 if len(text.split()) >= 2:
-                    emit('voice_detected', {'text': text})
+                    emit_to(session, 'voice_detected', {'text': text})
                 
         except sr.UnknownValueError:
             print("🎤 Could not understand audio")
-        except sr.RequestError as e:
+        except AsrUnavailable as e:
             print(f"🎤 Speech recognition error: {e}")
-            emit('voice_processing_error', {'error': str(e)})
+            emit_to(session, 'voice_processing_error', {'error': str(e)})
             
     except Exception as e:
         print(f"❌ Error in voice processing: {e}")
-        emit('voice_processing_error', {'error': str(e)})
-
-def process_voice_command_webm(webm_path):
-    """Process voice command from WebM audio file"""
-    try:
-        print("🎤 Processing WebM voice command...")
-        
-        # Try to use pydub for WebM processing
-        try:
-            from pydub import AudioSegment
-            from pydub.utils import which
-            
-            # Load WebM file
-            audio_segment = AudioSegment.from_file(webm_path, format="webm")
-            
-            # Convert to WAV format that speech_recognition can handle
-            wav_data = audio_segment.export(format="wav").read()
-            
-            # Save temporary WAV file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as wav_file:
-                wav_file.write(wav_data)
-                wav_path = wav_file.name
-            
-            # Process with speech recognition
-            process_voice_command(wav_path)
-            
-            # Clean up
-            os.unlink(wav_path)
-            
-        except ImportError:
-            print("❌ pydub not available, trying alternative approach")
-            # Fallback: try to process as raw audio
-            try:
-                with open(webm_path, 'rb') as f:
-                    raw_audio = f.read()
-                
-                # Try to process with speech recognition directly
-                # This is a fallback and may not work with all WebM files
-                print("⚠️ Attempting direct WebM processing (may not work)")
-                
-            except Exception as fallback_error:
-                print(f"❌ WebM processing failed: {fallback_error}")
-                emit('voice_processing_error', {'error': 'WebM audio format not supported'})
-                
-    except Exception as e:
-        print(f"❌ Error in WebM voice processing: {e}")
-        emit('voice_processing_error', {'error': str(e)})
+        emit_to(session, 'voice_processing_error', {'error': str(e)})
 
 # Background processing removed - using WebSocket-based processing instead
 
-def process_immediate_scan():
+def emit_to(session, event, data):
+    """Emit to one client from any thread (scheduler workers have no request context)"""
+    socketio.emit(event, data, to=session.sid)
+
+def frame_pixels(frame):
+    """Decoded frame to hand to YeongSil. In async mode YeongSil decodes the JPEG itself, inside its
+    offloaded steps, instead of the job decoding it on the event loop."""
+    return None if async_serving else frame.image
+
+def schedule_job(session, kind, fn, priority):
+    """Queue a scan/read for a session on the shared scheduler, reporting backpressure to the client"""
+    try:
+        scheduler.submit(session.sid, kind, lambda job: fn(session, job), priority)
+    except QueueFull:
+        print(f"⚠️ Processing queue full, skipping {kind}")
+        emit_to(session, 'voice_analysis_error', {'error': 'Processing queue full, please wait'})
+
+@tracer.traced('scan_job')
+def process_immediate_scan(session, job=None):
     """Process immediate scan with latest frame"""
-    global processing_queue
-    
     try:
         print("🔍 Processing immediate scan...")
+        session.stats['scans'] += 1
+        
+        # Newest frame at the time the job starts, not when it was queued
+        frame = session.latest_frame
+        if frame is None:
+            raise ValueError("No frame available")
+        
+        if stream_guidance:
+            # Forward sentence/clause sized chunks as Gemini produces them so the phone can start speaking early
+            depth_buckets, chunks = yeongsil_ai.stream_guidance_from_bytes(frame.jpeg, frame_pixels(frame), session_id=session.sid)
+            spoken = []
+            for index, chunk in enumerate(chunks):
+                if job is not None and job.cancelled:
+                    print("⚠️ Scan cancelled, client disconnected")
+                    return
+                emit_to(session, 'guidance_chunk', {'text': chunk, 'index': index})
+                spoken.append(chunk)
+            guidance = ' '.join(spoken)
+        else:
+            # Process with YeongSil (in memory, no temp file)
+            guidance, depth_buckets = yeongsil_ai.get_guidance_from_bytes(frame.jpeg, frame_pixels(frame), session_id=session.sid)
         
-        # Check processing queue to prevent overload
-        if len(processing_queue) >= max_queue_size:
-            print("⚠️ Processing queue full, skipping scan")
-            emit('voice_analysis_error', {'error': 'Processing queue full, please wait'})
+        if job is not None and job.cancelled:
+            print("⚠️ Scan cancelled, client disconnected")
             return
         
-        # Add to processing queue
-        processing_queue.append(time.time())
-        
-        # Decode base64 image
-        image_data = base64.b64decode(latest_frame.split(',')[1])
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-            tmp_file.write(image_data)
-            tmp_path = tmp_file.name
-        
-        # Process with YeongSil
-        guidance, depth_buckets = yeongsil_ai.get_guidance(tmp_path)
-        
-        # Clean up
-        os.unlink(tmp_path)
-        
-        # Remove from processing queue
-        if processing_queue:
-            processing_queue.pop(0)
-        
         # Log the guidance for debugging
         print(f"🔍 YeongSil guidance: {guidance}")
         print(f"📊 Depth buckets: {len(depth_buckets)} buckets")
@@ -348,59 +490,48 @@ def process_immediate_scan():
         depth_buckets_serializable = [float(bucket) for bucket in depth_buckets]
         
         # Send results
-        emit('voice_analysis_result', {
-            'guidance': guidance,
-            'depth_buckets': depth_buckets_serializable
-        })
+        if stream_guidance:
+            emit_to(session, 'guidance_complete', {
+                'guidance': guidance,
+                'depth_buckets': depth_buckets_serializable
+            })
+        else:
+            emit_to(session, 'voice_analysis_result', {
+                'guidance': guidance,
+                'depth_buckets': depth_buckets_serializable
+            })
         
         print("✅ Scan processing completed - guidance sent to frontend")
         
     except Exception as e:
-        # Remove from processing queue on error
-        if processing_queue:
-            processing_queue.pop(0)
+        session.stats['errors'] += 1
         print(f"❌ Error in immediate scan: {e}")
-        emit('voice_analysis_error', {'error': str(e)})
+        emit_to(session, 'voice_analysis_error', {'error': str(e)})
 
-def process_text_extraction():
+@tracer.traced('read_job')
+def process_text_extraction(session, job=None):
     """Process text extraction with latest frame"""
-    global processing_queue
-    
     try:
         print("📖 Processing text extraction...")
+        session.stats['reads'] += 1
         
-        # Check processing queue to prevent overload
-        if len(processing_queue) >= max_queue_size:
-            print("⚠️ Processing queue full, skipping text extraction")
-            emit('voice_analysis_error', {'error': 'Processing queue full, please wait'})
-            return
-        
-        # Add to processing queue
-        processing_queue.append(time.time())
-        
-        # Decode base64 image
-        image_data = base64.b64decode(latest_frame.split(',')[1])
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-            tmp_file.write(image_data)
-            tmp_path = tmp_file.name
+        # Newest frame at the time the job starts, not when it was queued
+        frame = session.latest_frame
+        if frame is None:
+            raise ValueError("No frame available")
         
-        # Process with YeongSil text extraction
-        extracted_text = yeongsil_ai.get_text_from_image(tmp_path)
+        # Process with YeongSil text extraction (the JPEG goes to Gemini as-is, no decode needed)
+        extracted_text = yeongsil_ai.get_text_from_bytes(frame.jpeg, session_id=session.sid)
         
-        # Clean up
-        os.unlink(tmp_path)
-        
-        # Remove from processing queue
-        if processing_queue:
-            processing_queue.pop(0)
+        if job is not None and job.cancelled:
+            print("⚠️ Text extraction cancelled, client disconnected")
+            return
         
         # Log the extracted text for debugging
         print(f"📖 Extracted text: {extracted_text}")
         
         # Send results
-        emit('voice_analysis_result', {
+        emit_to(session, 'voice_analysis_result', {
             'guidance': extracted_text,
             'depth_buckets': []  # No depth data for text extraction
         })
@@ -408,19 +539,43 @@ def process_text_extraction():
         print("✅ Text extraction completed - text sent to frontend")
         
     except Exception as e:
-        # Remove from processing queue on error
-        if processing_queue:
-            processing_queue.pop(0)
+        session.stats['errors'] += 1
         print(f"❌ Error in text extraction: {e}")
-        emit('voice_analysis_error', {'error': str(e)})
+        emit_to(session, 'voice_analysis_error', {'error': str(e)})
+
+@tracer.traced('obstacle_check')
+def process_obstacle_check(session, job=None):
+    """Run the local depth pipeline on the latest frame and push an alert if the way ahead is blocked"""
+    frame, state = session.latest_frame, session.monitor
+    if frame is None or state is None or (job is not None and job.cancelled):
+        return
+    try:
+        depth_buckets = yeongsil_ai.get_depth_buckets_from_bytes(frame.jpeg, frame_pixels(frame), session_id=session.sid)
+        alert = obstacle_monitor.update(state, depth_buckets)
+        if alert is not None:
+            tracer.count('obstacle_alerts')
+            if log_frames:
+                print(f"🚧 Obstacle alert: {alert}")
+            emit_to(session, 'obstacle_alert', alert)
+    except Exception as e:
+        session.stats['errors'] += 1
+        print(f"❌ Error in obstacle check: {e}")
 
 # Note: Continuous voice processing is now handled via WebSocket audio_data events
 # This is more reliable than background threads and avoids Flask context issues
 
 if __name__ == '__main__':
+    port = int(os.environ.get('YEONGSIL_PORT', 8080))
     print("🚀 Starting YeongSil Navigation Assistant...")
-    print("📱 Server will be available at http://0.0.0.0:8080")
+    print(f"📱 Server will be available at http://0.0.0.0:{port}")
     print("🎤 Voice recognition: Active")
-    print("🤖 YeongSil AI: Ready" if yeongsil_ai else "❌ YeongSil AI: Not available")
+    print(f"🤖 YeongSil AI: {yeongsil_state}")
     
-    socketio.run(app, host='0.0.0.0', port=8080, debug=True)
\ No newline at end of file
+    if async_serving:
+        print(f"⚡ Async serving: eventlet, {cpu_threads} CPU threads, debug and reloader off")
+        socketio.run(app, host='0.0.0.0', port=port, debug=False, use_reloader=False, log_output=log_frames)
+    else:
+        # Werkzeug is only the dev server; without allow_unsafe_werkzeug Flask-SocketIO refuses to start
+        # it in threading mode whenever stdin is not a TTY (systemd, docker, nohup, loadgen --spawn)
+        socketio.run(app, host='0.0.0.0', port=port, debug=dev_debug, use_reloader=dev_debug,
+                     allow_unsafe_werkzeug=True)
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""
+Pluggable speech recognition backends for voice commands.
+
+    google       - Google Web Speech API via speech_recognition (network, open vocabulary)
+    vosk         - offline Vosk/Kaldi recognizer restricted to the command grammar
+    sphinx       - offline PocketSphinx keyword spotting for the command words
+    local_first  - vosk, falling back to google when no command was heard
+    cloud_first  - google, falling back to vosk when the network request fails
+    stub         - offline_stubs.StubAsrBackend for load tests (recognizes synthetic command tones)
+
+Benchmark on recorded clips (file name prefix is the expected command: scan_*.wav, read_*.webm, none_*.wav):
+    python asr_backends.py clips/ [--backends google vosk local_first]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import speech_recognition as sr
+
+ASR_MODES = ('google', 'vosk', 'sphinx', 'local_first', 'cloud_first', 'stub')
+
+SCAN_PHRASES = ["scan surroundings", "scan", "scanning"]
+READ_PHRASES = ["read", "reading", "read this", "read that"]
+# Restricted grammar for the offline recognizers; [unk] absorbs everything else
+COMMAND_GRAMMAR = ["scan surroundings", "scan", "scanning", "read this", "read that", "read", "reading", "[unk]"]
+
+VOSK_MODEL_DIR = os.environ.get(
+    'YEONGSIL_VOSK_MODEL', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'vosk-model-small-en-us-0.15'))
+
+
+def match_command(text: str):
+    """Map recognized text to 'scan', 'read' or None"""
+    if not text:
+        return None
+    if any(phrase in text for phrase in SCAN_PHRASES):
+        return 'scan'
+    if any(phrase in text for phrase in READ_PHRASES):
+        return 'read'
+    return None
+
+
+class AsrUnavailable(Exception):
+    """The backend could not be reached (e.g. sr.RequestError for cloud recognizers)"""
+
+
+class AsrBackend:
+    name = 'base'
+    local = True  # CPU-bound on this machine; False for backends that mostly wait on the network
+
+    def transcribe(self, audio: sr.AudioData):
+        """Lower-case transcript, or None when nothing was understood"""
+        raise NotImplementedError
+
+
+class GoogleAsrBackend(AsrBackend):
+    name = 'google'
+    local = False
+
+    def __init__(self, recognizer: sr.Recognizer = None, language: str = 'en-US'):
+        self.recognizer = recognizer or sr.Recognizer()
+        self.language = language
+
+    def transcribe(self, audio: sr.AudioData):
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language).lower()
+        except sr.UnknownValueError:
+            return None
+        except sr.RequestError as e:
+            raise AsrUnavailable(str(e))
+
+
+class VoskAsrBackend(AsrBackend):
+    name = 'vosk'
+
+    def __init__(self, model_dir: str = VOSK_MODEL_DIR, grammar: list = COMMAND_GRAMMAR):
+        try:
+            import vosk
+        except ImportError:
+            raise RuntimeError("The vosk ASR backend needs the vosk package (pip install vosk)")
+        if not os.path.isdir(model_dir):
+            raise RuntimeError(f"Vosk model not found at {model_dir} (set YEONGSIL_VOSK_MODEL)")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(model_dir)
+        self.grammar = json.dumps(grammar)
+
+    def transcribe(self, audio: sr.AudioData):
+        recognizer = self._vosk.KaldiRecognizer(self.model, 16000, self.grammar)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=16000, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get('text', '')
+        text = text.replace('[unk]', '').strip()
+        return text or None
+
+
+class SphinxAsrBackend(AsrBackend):
+    name = 'sphinx'
+
+    def __init__(self, recognizer: sr.Recognizer = None, sensitivity: float = 0.8):
+        self.recognizer = recognizer or sr.Recognizer()
+        self.keywords = [(word, sensitivity) for word in ('scan', 'scanning', 'surroundings', 'read', 'reading')]
+
+    def transcribe(self, audio: sr.AudioData):
+        try:
+            return self.recognizer.recognize_sphinx(audio, keyword_entries=self.keywords).lower().strip() or None
+        except sr.UnknownValueError:
+            return None
+        except sr.RequestError as e:
+            raise AsrUnavailable(str(e))
+
+
+class ChainedAsrBackend(AsrBackend):
+    """Tries backends in order, skipping unavailable ones. With until_command (local_first) it stops at
+    the first transcript containing a command and otherwise keeps the best transcript seen so far;
+    without it (cloud_first) the first available backend's transcript is final, so a grammar-bound
+    fallback never overrides an open-vocabulary transcript that simply holds no command."""
+
+    def __init__(self, name: str, backends: list, until_command: bool = True):
+        self.name = name
+        self.backends = backends
+        self.until_command = until_command
+        self.local = all(backend.local for backend in backends)
+
+    def transcribe(self, audio: sr.AudioData):
+        best, error = None, None
+        for backend in self.backends:
+            try:
+                text = backend.transcribe(audio)
+            except AsrUnavailable as e:
+                error = e
+                continue
+            if not self.until_command or match_command(text):
+                return text
+            best = best or text
+        if best is None and error is not None:
+            raise error
+        return best
+
+
+def create_asr_backend(mode: str, recognizer: sr.Recognizer = None) -> AsrBackend:
+    if mode == 'google':
+        return GoogleAsrBackend(recognizer)
+    if mode == 'vosk':
+        return VoskAsrBackend()
+    if mode == 'sphinx':
+        return SphinxAsrBackend(recognizer)
+    if mode == 'local_first':
+        return ChainedAsrBackend(mode, [VoskAsrBackend(), GoogleAsrBackend(recognizer)])
+    if mode == 'cloud_first':
+        return ChainedAsrBackend(mode, [GoogleAsrBackend(recognizer), VoskAsrBackend()], until_command=False)
+    if mode == 'stub':
+        from offline_stubs import StubAsrBackend
+        return StubAsrBackend(latency=float(os.environ.get('YEONGSIL_STUB_ASR_LATENCY', 0.0)))
+    raise ValueError(f"Unknown ASR mode '{mode}', expected one of {', '.join(ASR_MODES)}")
+
+
+def benchmark(clips_dir: str, modes: list) -> dict:
+    """Latency and command accuracy of each ASR mode over labelled clips"""
+    from audio_pipeline import AudioDecoder
+
+    decoder = AudioDecoder()
+    clips = []
+    for file_name in sorted(os.listdir(clips_dir)):
+        label = file_name.split('_', 1)[0]
+        if label not in ('scan', 'read', 'none'):
+            continue
+        with open(os.path.join(clips_dir, file_name), 'rb') as f:
+            data = f.read()
+        mime_type = 'audio/wav' if file_name.endswith('.wav') else 'audio/webm'
+        clips.append((None if label == 'none' else label, decoder.to_audio_data(decoder.decode(data, mime_type))))
+
+    report = {}
+    for mode in modes:
+        backend = create_asr_backend(mode)
+        latencies, correct, errors = [], 0, 0
+        for expected, audio in clips:
+            start = time.perf_counter()
+            try:
+                text = backend.transcribe(audio)
+            except AsrUnavailable:
+                text = None
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+            correct += match_command(text) == expected
+        report[mode] = {
+            'clips': len(clips),
+            'command_accuracy': correct / len(clips) if clips else 0.0,
+            'p50_ms': 1000 * float(np.percentile(latencies, 50)) if latencies else 0.0,
+            'p95_ms': 1000 * float(np.percentile(latencies, 95)) if latencies else 0.0,
+            'unavailable': errors,
+        }
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark ASR backends on labelled voice command clips')
+    parser.add_argument('clips', help='directory of scan_*/read_*/none_* audio clips')
+    parser.add_argument('--backends', nargs='+', default=['google', 'vosk', 'local_first'], choices=ASR_MODES)
+    args = parser.parse_args()
+
+    for mode, stats in benchmark(args.clips, args.backends).items():
+        print(f"{mode:12s} accuracy {stats['command_accuracy']:.0%} ({stats['clips']} clips)  "
+              f"p50 {stats['p50_ms']:.0f} ms  p95 {stats['p95_ms']:.0f} ms  unavailable {stats['unavailable']}")
@@ -0,0 +1,128 @@
+"""
+In-memory audio ingestion for voice commands.
+
+Turns the encoded chunks sent by mobile_app.html (WebM/Opus, MP4/AAC or WAV) into 16 kHz mono
+16-bit PCM without touching disk. Decoding happens in-process with PyAV when it is installed;
+otherwise ffmpeg is fed through stdin/stdout pipes, and pydub is the last resort.
+"""
+
+import io
+import shutil
+import subprocess
+import threading
+import time
+import wave
+
+import speech_recognition as sr
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # bytes, s16le
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+class AudioDecodeError(Exception):
+    pass
+
+
+class AudioDecoder:
+    def __init__(self, ffmpeg_timeout: float = 3.0):
+        self.ffmpeg = shutil.which('ffmpeg')
+        self.ffmpeg_timeout = ffmpeg_timeout
+        self._lock = threading.Lock()
+        self.counts = {'wav': 0, 'pyav': 0, 'ffmpeg': 0, 'pydub': 0, 'failed': 0}
+        self.decode_time = 0.0
+
+    def decode(self, data: bytes, mime_type: str = 'audio/webm') -> bytes:
+        """Decode one encoded chunk to 16 kHz mono s16le PCM bytes"""
+        try:
+            method, pcm, elapsed = self.convert(data, mime_type)
+        except AudioDecodeError:
+            self.record('failed')
+            raise
+        self.record(method, elapsed)
+        return pcm
+
+    def convert(self, data: bytes, mime_type: str = 'audio/webm') -> tuple[str, bytes, float]:
+        """The decoding half of decode(), returning (method, pcm, seconds) without touching the stats.
+        Takes no lock, so it can run on a native thread pool; the caller then calls record()"""
+        start = time.perf_counter()
+        for method, decoder in self._decoders(mime_type):
+            try:
+                pcm = decoder(data)
+            except Exception as e:
+                print(f"⚠️ {method} audio decode failed: {e}")
+                continue
+            return method, pcm, time.perf_counter() - start
+        raise AudioDecodeError(f"Could not decode {mime_type} audio ({len(data)} bytes)")
+
+    def record(self, method: str, elapsed: float = 0.0):
+        """Count one decode by method ('failed' for none) and add its time to the mean"""
+        with self._lock:
+            self.counts[method] += 1
+            self.decode_time += elapsed
+
+    def to_audio_data(self, pcm: bytes) -> sr.AudioData:
+        return sr.AudioData(pcm, SAMPLE_RATE, SAMPLE_WIDTH)
+
+    def stats(self) -> dict:
+        with self._lock:
+            decoded = sum(count for method, count in self.counts.items() if method != 'failed')
+            return {
+                **self.counts,
+                'backend': 'pyav' if av is not None else ('ffmpeg' if self.ffmpeg else 'pydub'),
+                'mean_decode_ms': 1000 * self.decode_time / decoded if decoded else 0.0,
+            }
+
+    def _decoders(self, mime_type: str):
+        if 'wav' in mime_type:
+            yield 'wav', self._decode_wav
+        if av is not None:
+            yield 'pyav', self._decode_pyav
+        if self.ffmpeg:
+            yield 'ffmpeg', self._decode_ffmpeg
+        yield 'pydub', self._decode_pydub
+
+    def _decode_wav(self, data: bytes) -> bytes:
+        with wave.open(io.BytesIO(data)) as wav:
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (SAMPLE_RATE, 1, SAMPLE_WIDTH):
+                raise ValueError("WAV is not 16 kHz mono s16, needs resampling")
+            return wav.readframes(wav.getnframes())
+
+    def _decode_pyav(self, data: bytes) -> bytes:
+        pcm = bytearray()
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=SAMPLE_RATE)
+        with av.open(io.BytesIO(data), mode='r') as container:
+            for frame in container.decode(audio=0):
+                for out in _as_list(resampler.resample(frame)):
+                    pcm += out.to_ndarray().tobytes()
+        try:
+            for out in _as_list(resampler.resample(None)):  # flush buffered samples
+                pcm += out.to_ndarray().tobytes()
+        except (TypeError, ValueError):
+            pass  # older PyAV has no flush
+        return bytes(pcm)
+
+    def _decode_ffmpeg(self, data: bytes) -> bytes:
+        result = subprocess.run([
+            self.ffmpeg, '-loglevel', 'error', '-i', 'pipe:0',
+            '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-ac', '1', 'pipe:1'
+        ], input=data, capture_output=True, timeout=self.ffmpeg_timeout)
+        if result.returncode != 0 or not result.stdout:
+            raise RuntimeError(result.stderr.decode(errors='replace').strip() or 'no output')
+        return result.stdout
+
+    def _decode_pydub(self, data: bytes) -> bytes:
+        from pydub import AudioSegment
+        segment = AudioSegment.from_file(io.BytesIO(data))
+        segment = segment.set_frame_rate(SAMPLE_RATE).set_channels(1).set_sample_width(SAMPLE_WIDTH)
+        return segment.raw_data
+
+
+def _as_list(frames):
+    if frames is None:
+        return []
+    return frames if isinstance(frames, list) else [frames]
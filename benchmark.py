@@ -0,0 +1,220 @@
+"""
+Offline benchmark of the YeongSil scan pipeline, stage by stage.
+
+Runs without network access: Gemini is replaced by offline_stubs.StubGeminiClient with a configurable
+latency, and frames/audio come from a fixed corpus (generated deterministically, or --corpus DIR
+with *.jpg/*.png frames and *.wav/*.webm clips). Each stage reports p50/p95 latency and its peak
+memory: traced Python/numpy allocations (tracemalloc) and growth of the process RSS high-water mark.
+
+    python benchmark.py                              # report only
+    python benchmark.py --save-baseline              # store the report as the baseline
+    python benchmark.py --baseline bench/base.json   # exit 1 when a stage regressed past --threshold
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+import torch
+
+from audio_pipeline import AudioDecoder, AudioDecodeError
+from offline_stubs import StubGeminiClient, synthetic_frames
+from response_cache import response_key
+from speech_stream import StreamingSpeechBuffer
+from depth_pipeline import DepthPipeline, device
+from YeongSil import YeongSil, guidance_parts
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+STAGES = ('decode', 'transform', 'midas_forward', 'interpolate', 'bucketing', 'prompt_build',
+          'asr_decode', 'vad_endpointing', 'scan_total')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'baseline.json')
+
+
+def synthetic_clips(n: int = 4, seed: int = 0) -> list[tuple[bytes, str]]:
+    """2 s 44.1 kHz WAV clips with a voiced burst, so decoding has to resample like real phone audio"""
+    rng = np.random.default_rng(seed)
+    rate = 44100
+    clips = []
+    for _ in range(n):
+        t = np.arange(2 * rate) / rate
+        signal = rng.normal(0, 200, t.size)
+        start = rng.uniform(0.2, 1.0)
+        burst = (t > start) & (t < start + 0.6)
+        signal[burst] += 6000 * np.sin(2 * np.pi * rng.uniform(120, 250) * t[burst]) * np.sin(np.pi * (t[burst] - start) / 0.6)
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes(signal.astype(np.int16).tobytes())
+        clips.append((buffer.getvalue(), 'audio/wav'))
+    return clips
+
+
+def load_corpus(corpus_dir: str) -> tuple[list[bytes], list[tuple[bytes, str]]]:
+    frames, clips = [], []
+    for file_name in sorted(os.listdir(corpus_dir)):
+        with open(os.path.join(corpus_dir, file_name), 'rb') as f:
+            data = f.read()
+        extension = os.path.splitext(file_name)[1].lower()
+        if extension in ('.jpg', '.jpeg', '.png'):
+            frames.append(data)
+        elif extension in ('.wav', '.webm'):
+            clips.append((data, 'audio/wav' if extension == '.wav' else 'audio/webm'))
+    return frames, clips
+
+
+def _max_rss_kb() -> int:
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss  # bytes on macOS, KiB on Linux
+
+
+def measure(fn, inputs: list, iterations: int) -> dict:
+    """Time fn over the inputs (round robin), then trace one extra call for peak allocations"""
+    fn(inputs[0])  # warm-up, not counted
+    rss_before = _max_rss_kb()
+    times = []
+    for i in range(iterations):
+        item = inputs[i % len(inputs)]
+        start = time.perf_counter()
+        fn(item)
+        times.append(time.perf_counter() - start)
+    rss_growth = _max_rss_kb() - rss_before
+
+    tracemalloc.start()
+    fn(inputs[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times = np.array(times)
+    return {
+        'p50_ms': 1000 * float(np.percentile(times, 50)),
+        'p95_ms': 1000 * float(np.percentile(times, 95)),
+        'peak_kb': peak // 1024,
+        'rss_growth_kb': rss_growth,
+    }
+
+
+def run(iterations: int = 30, gemini_latency: float = 0.0, corpus_dir: str = None, depth_backend: str = 'torch') -> dict:
+    frames, clips = load_corpus(corpus_dir) if corpus_dir else (synthetic_frames(), synthetic_clips())
+    stub = StubGeminiClient(latency=gemini_latency)
+    ai = YeongSil(depth_backend=depth_backend, gemini_client=stub)
+
+    # Precompute each stage's input from the previous stage so stages are timed in isolation.
+    # Every stage calls the pipeline's own code, so a change there shows up in its numbers.
+    decoded = [YeongSil.prepare_image(frame) for frame in frames]
+    batches = [ai.depth.transform_image(img) for img in decoded]
+    with torch.no_grad():
+        predictions = [ai.depth.depth_backend(batch) for batch in batches]
+
+    def interpolate(prediction):
+        return DepthPipeline.interpolate(prediction, (600, 600)).squeeze().cpu().numpy()
+
+    depth_maps = [interpolate(prediction) for prediction in predictions]
+    bucket_sets = [ai.depth.bucketer(depth) for depth in depth_maps]
+
+    def prompt_build(args):
+        frame, depth_buckets = args
+        return response_key('gemini-2.5-flash', guidance_parts(depth_buckets, image_bytes=frame))
+
+    decoder = AudioDecoder()
+
+    def asr_decode(clip):
+        return decoder.decode(*clip)
+
+    def scan_total(frame):
+        ai.response_cache.clear()  # every iteration pays the (stubbed) Gemini round-trips
+        return ai.get_guidance_from_bytes(frame)
+
+    stage_inputs = {
+        'decode': (YeongSil.prepare_image, frames),
+        'transform': (ai.depth.transform_image, decoded),
+        'midas_forward': (lambda batch: ai.depth.depth_backend(batch), batches),
+        'interpolate': (interpolate, predictions),
+        'bucketing': (ai.depth.bucketer, depth_maps),
+        'prompt_build': (prompt_build, list(zip(frames, bucket_sets))),
+        'scan_total': (scan_total, frames),
+    }
+    try:
+        pcm_clips = [asr_decode(clip) for clip in clips]
+        stage_inputs['asr_decode'] = (asr_decode, clips)
+        stage_inputs['vad_endpointing'] = (lambda pcm: StreamingSpeechBuffer().feed(pcm), pcm_clips)
+    except AudioDecodeError as e:
+        print(f"⚠️ Skipping audio stages: {e}")
+
+    report = {'stages': {}, 'config': {
+        'iterations': iterations, 'gemini_latency': gemini_latency, 'depth_backend': depth_backend,
+        'corpus': corpus_dir or 'synthetic', 'frames': len(frames), 'clips': len(clips), 'device': str(device),
+    }}
+    for stage in STAGES:
+        if stage not in stage_inputs:
+            continue
+        fn, inputs = stage_inputs[stage]
+        with torch.no_grad():
+            report['stages'][stage] = measure(fn, inputs, iterations)
+    report['gemini_calls'] = stub.calls
+    return report
+
+
+def compare(report: dict, baseline: dict, threshold: float = 0.2, min_delta_ms: float = 0.5) -> list[str]:
+    """Stages whose p50 or p95 got slower than the baseline by more than threshold (and min_delta_ms)"""
+    regressions = []
+    for stage, current in report['stages'].items():
+        base = baseline.get('stages', {}).get(stage)
+        if base is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if current[metric] > base[metric] * (1 + threshold) and current[metric] - base[metric] > min_delta_ms:
+                regressions.append(f"{stage} {metric}: {base[metric]:.2f} -> {current[metric]:.2f} ms "
+                                   f"(+{100 * (current[metric] / base[metric] - 1):.0f}%)")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline per-stage benchmark of the YeongSil pipeline')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--gemini-latency', type=float, default=0.0, help='seconds per stubbed Gemini request')
+    parser.add_argument('--corpus', help='directory of frames (*.jpg, *.png) and clips (*.wav, *.webm)')
+    parser.add_argument('--depth-backend', default='torch')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='write this run to --baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown per stage (0.2 = 20%%)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = run(args.iterations, args.gemini_latency, args.corpus, args.depth_backend)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for stage, stats in report['stages'].items():
+            print(f"{stage:16s} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+                  f"peak {stats['peak_kb']:7d} KiB  rss +{stats['rss_growth_kb']} KiB")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('config', {}) != report['config']:
+            print("⚠️ Baseline was recorded with a different configuration, comparison may be misleading")
+        regressions = compare(report, baseline, args.threshold)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No stage slower than baseline by more than {args.threshold:.0%}")
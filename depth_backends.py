@@ -0,0 +1,140 @@
+"""
+Pluggable depth backends for YeongSil.
+
+Every backend takes a preprocessed (N, 3, H, W) float tensor and returns an (N, H, W) depth tensor,
+so it can sit behind the DepthBatcher unchanged.
+
+    torch      - MiDaS_small in PyTorch (TorchScript from the local cache, or eager via torch.hub)
+    onnx       - the ONNX export running on ONNX Runtime
+    onnx-int8  - the dynamically quantized INT8 ONNX export running on ONNX Runtime
+
+Run a parity check against the eager model's depth buckets (needs the ONNX artifacts from
+`python model_cache.py --onnx`):
+    python depth_backends.py [image.jpg ...] [--backends torch onnx onnx-int8]
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+import torch
+
+import model_cache
+from depth_buckets import DepthBucketer
+
+DEPTH_BACKENDS = ('torch', 'onnx', 'onnx-int8')
+
+
+class DepthBackend:
+    """Base class: callable mapping an (N, 3, H, W) tensor to an (N, H, W) depth tensor"""
+    name = 'base'
+
+    def __call__(self, input_batch: torch.Tensor) -> torch.Tensor:
+        raise NotImplementedError
+
+
+class TorchDepthBackend(DepthBackend):
+    name = 'torch'
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, input_batch: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            return self.model(input_batch)
+
+
+class OnnxDepthBackend(DepthBackend):
+    name = 'onnx'
+
+    def __init__(self, model_path: str, intra_op_threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("The onnx depth backends need the onnxruntime package (pip install onnxruntime)")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, input_batch: torch.Tensor) -> torch.Tensor:
+        depth = self.session.run(None, {self.input_name: input_batch.detach().cpu().numpy()})[0]
+        return torch.from_numpy(depth)
+
+
+def create_depth_backend(name: str, device: torch.device, cache_dir: str = model_cache.MODEL_CACHE_DIR):
+    """Return (transform, backend) for one of DEPTH_BACKENDS"""
+    if name == 'torch':
+        transform, model = model_cache.load_midas(device, cache_dir)
+        return transform, TorchDepthBackend(model)
+
+    if name in ('onnx', 'onnx-int8'):
+        artifact = 'onnx' if name == 'onnx' else 'onnx_int8'
+        model_path = model_cache.artifact_path(artifact, cache_dir)
+        if model_path is None:
+            raise RuntimeError(f"No cached {artifact} artifact in {cache_dir}; run `python model_cache.py --onnx` first")
+        backend = OnnxDepthBackend(model_path)
+        backend.name = name
+        print(f"📦 Loaded {name} depth backend from {model_path}")
+        return model_cache.midas_small_transform, backend
+
+    raise ValueError(f"Unknown depth backend '{name}', expected one of {', '.join(DEPTH_BACKENDS)}")
+
+
+def _buckets_for(backend, transform, img: np.ndarray, bucketer: DepthBucketer) -> list[float]:
+    # Mirrors YeongSil.__get_depth_buckets on a 600x600 frame
+    img_small = cv2.cvtColor(cv2.resize(img, (256, 256)), cv2.COLOR_BGR2RGB)
+    prediction = backend(transform(img_small))
+    with torch.no_grad():
+        prediction = torch.nn.functional.interpolate(
+            prediction.unsqueeze(1), size=img.shape[:2], mode="bicubic", align_corners=False)
+    return bucketer(prediction.squeeze().cpu().numpy())
+
+
+def parity_check(images: list, backends: list, device: torch.device = torch.device('cpu')) -> dict:
+    """Compare each backend's depth buckets and latency against the eager hub model"""
+    bucketer = DepthBucketer()
+    ref_transform, ref_model = model_cache.load_hub_midas(device)
+    reference = TorchDepthBackend(ref_model)
+    ref_buckets = [np.array(_buckets_for(reference, ref_transform, img, bucketer)) for img in images]
+
+    report = {}
+    for name in backends:
+        transform, backend = create_depth_backend(name, device)
+        _buckets_for(backend, transform, images[0], bucketer)  # warm-up
+
+        errors, latencies = [], []
+        for img, ref in zip(images, ref_buckets):
+            start = time.perf_counter()
+            buckets = np.array(_buckets_for(backend, transform, img, bucketer))
+            latencies.append(time.perf_counter() - start)
+            errors.append(np.abs(buckets - ref))
+
+        errors = np.concatenate(errors)
+        report[name] = {
+            'max_abs_error': float(errors.max()),
+            'mean_abs_error': float(errors.mean()),
+            'mean_latency_ms': 1000 * float(np.mean(latencies)),
+        }
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Depth backend parity check against the eager MiDaS model')
+    parser.add_argument('images', nargs='*', help='JPEG/PNG frames (defaults to synthetic frames)')
+    parser.add_argument('--backends', nargs='+', default=list(DEPTH_BACKENDS), choices=DEPTH_BACKENDS)
+    args = parser.parse_args()
+
+    if args.images:
+        frames = [cv2.resize(cv2.imread(path), (600, 600)) for path in args.images]
+    else:
+        rng = np.random.default_rng(0)
+        frames = [cv2.GaussianBlur(rng.integers(0, 256, (600, 600, 3), dtype=np.uint8), (31, 31), 0) for _ in range(4)]
+
+    for name, stats in parity_check(frames, args.backends).items():
+        print(f"{name:10s} max |Δbucket| {stats['max_abs_error']:.3f}  mean |Δbucket| {stats['mean_abs_error']:.3f}  "
+              f"{stats['mean_latency_ms']:.1f} ms/frame")
@@ -0,0 +1,116 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+
+from offload import run_offloaded
+
+
+class DepthBatcher:
+    """Collects depth requests from all sessions and runs them through the model in micro-batches.
+
+    Callers hand in a preprocessed (1, C, H, W) tensor and block on a future. A single worker
+    thread drains the queue, waiting at most max_wait_ms for up to max_batch_size frames, runs
+    one forward pass and hands every caller back its own (1, H, W) slice of the prediction.
+    """
+
+    def __init__(self, infer_fn, max_batch_size: int = 8, max_wait_ms: float = 5.0, offload=None):
+        self.infer_fn = infer_fn
+        self.offload = offload  # offload(fn, *args) runs the forward pass, e.g. on a native thread pool
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._frames = 0
+        self._occupancy = [0] * (self.max_batch_size + 1)  # occupancy[n] = number of batches of size n
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._run, name='depth-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, input_batch: torch.Tensor) -> Future:
+        """Queue a (1, C, H, W) tensor and return a future resolving to its (1, H, W) depth map"""
+        if self._stopped:
+            raise RuntimeError("DepthBatcher has been closed")
+        future = Future()
+        self._queue.put((input_batch, future))
+        return future
+
+    def infer(self, input_batch: torch.Tensor) -> torch.Tensor:
+        """Blocking helper around submit()"""
+        return self.submit(input_batch).result()
+
+    def stats(self) -> dict:
+        """Batch occupancy statistics since startup"""
+        with self._stats_lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': self._batches,
+                'frames': self._frames,
+                'mean_batch_size': self._frames / self._batches if self._batches else 0.0,
+                'occupancy': {size: count for size, count in enumerate(self._occupancy) if count},
+                'pending': self._queue.qsize(),
+            }
+
+    def close(self):
+        self._stopped = True
+        self._queue.put(None)
+        self._thread.join(timeout=1.0)
+
+    def _collect(self) -> list:
+        item = self._queue.get()
+        if item is None:
+            return []
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # let the outer loop see the stop signal
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not self._stopped:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            # Frames of different sizes cannot share a forward pass
+            groups = {}
+            for input_batch, future in batch:
+                groups.setdefault(tuple(input_batch.shape[1:]), []).append((input_batch, future))
+
+            for items in groups.values():
+                self._run_group(items)
+
+    def _run_group(self, items: list):
+        items = [(input_batch, future) for input_batch, future in items if future.set_running_or_notify_cancel()]
+        if not items:
+            return
+        futures = [future for _, future in items]
+        try:
+            batch = torch.cat([input_batch for input_batch, _ in items], dim=0)
+            prediction = run_offloaded(self.offload, self.infer_fn, batch)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for i, future in enumerate(futures):
+            future.set_result(prediction[i:i + 1])
+
+        with self._stats_lock:
+            self._batches += 1
+            self._frames += len(futures)
+            self._occupancy[len(futures)] += 1
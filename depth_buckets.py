@@ -0,0 +1,41 @@
+import numpy as np
+
+
+class DepthBucketer:
+    """Reduces a MiDaS depth map to average free space per 10 degree angle bucket.
+
+    Produces the same numbers as the original point-cloud implementation in YeongSil without
+    building the per-pixel coordinate arrays. Each pixel's lateral offset only depends on its
+    column, so the offset grid is computed once per (h, w) and cached. The forward component
+    comes from the depth value itself, so the angle is still evaluated per pixel, but all
+    buckets are reduced with a single pair of np.bincount calls.
+    """
+
+    def __init__(self, bucket_edges: np.ndarray = None):
+        self.bucket_edges = np.arange(-90, 91, 10) if bucket_edges is None else np.asarray(bucket_edges)
+        self.n_buckets = len(self.bucket_edges) - 1
+        self._x_grids = {}
+
+    def x_grid(self, h: int, w: int) -> np.ndarray:
+        """Flattened lateral offset of every pixel for an (h, w) depth map"""
+        grid = self._x_grids.get((h, w))
+        if grid is None:
+            # The original code flipped both the x and depth arrays, which pairs depth[r, c]
+            # with an offset of c / 40 centred around zero.
+            cols = np.arange(w) / 40
+            grid = np.tile(cols - cols.mean(), h)
+            grid.flags.writeable = False
+            self._x_grids[(h, w)] = grid
+        return grid
+
+    def __call__(self, depth: np.ndarray) -> list[float]:
+        h, w = depth.shape
+        x_coords = self.x_grid(h, w)
+        y_coords = -depth.ravel() / 80 + 35
+
+        angles = np.degrees(np.arctan2(x_coords, y_coords))
+        bucket_indices = np.clip(np.digitize(angles, self.bucket_edges) - 1, 0, self.n_buckets - 1)
+
+        sums = np.bincount(bucket_indices, weights=y_coords, minlength=self.n_buckets)
+        counts = np.bincount(bucket_indices, minlength=self.n_buckets)
+        return [float(sums[i] / counts[i]) if counts[i] else 0.0 for i in range(self.n_buckets)]
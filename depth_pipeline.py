@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+import torch
+
+from depth_backends import create_depth_backend
+from depth_batcher import DepthBatcher
+from depth_buckets import DepthBucketer
+from offload import run_offloaded
+from temporal_depth import TemporalDepthCache
+from tracing import tracer
+
+device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
+
+
+class DepthPipeline:
+    """The local, model-owning half of YeongSil: 600x600 BGR frame in, depth buckets out.
+
+    Owns the MiDaS backend, the micro-batching worker, the bucketer and (optionally) temporal
+    reuse of warped depth maps. YeongSil runs one in-process; depth_server.py runs one for many web
+    workers, which reach it through DepthClient (same depth_buckets/stats/drop interface).
+
+    The CPU-bound steps (model loading, pre/post-processing, the forward pass) go through the
+    offload hook (see offload.py).
+    """
+
+    def __init__(self, depth_backend: str = 'torch', max_batch_size: int = 8, max_batch_wait_ms: float = 5.0,
+                 native_depth_resolution: bool = False, temporal_depth: bool = False, offload=None):
+        self.offload = offload
+
+        # Use faster MiDaS model for better performance (torch, onnx or onnx-int8, see depth_backends.py)
+        # Loading goes through offload too, so an async server keeps answering /health meanwhile
+        self.transform, self.depth_backend = run_offloaded(self.offload, create_depth_backend, depth_backend, device)
+
+        # Depth requests from every session are funnelled through one micro-batching worker
+        self.depth_batcher = DepthBatcher(self.depth_backend, max_batch_size=max_batch_size,
+                                          max_wait_ms=max_batch_wait_ms, offload=offload)
+
+        # Bucket at MiDaS' own 256x256 output instead of upsampling to 600x600 first (much cheaper,
+        # but the buckets are no longer identical to the upsampled ones)
+        self.native_depth_resolution = native_depth_resolution
+        self.bucketer = DepthBucketer()
+
+        # Per-session reuse of warped depth maps while the camera moves only slightly (keyframes get full MiDaS)
+        self.temporal_depth = TemporalDepthCache() if temporal_depth else None
+
+    # Runs MiDaS on a BGR image and returns the average depth for each 10 degree angle bucket.
+    # With temporal_depth on and a session_id given, every inference becomes the session's keyframe,
+    # and requests with reuse=True (obstacle monitor checks) get a depth map warped from it instead
+    # when the camera barely moved since. Scans leave reuse off and always see fresh depth.
+    def depth_buckets(self, img: np.ndarray, session_id=None, reuse: bool = False) -> list[float]:
+        probe = None
+        if self.temporal_depth is not None and session_id is not None:
+            with tracer.span('motion'):
+                probe = run_offloaded(self.offload, self.temporal_depth.probe, img)
+                depth = self.temporal_depth.lookup(session_id, probe) if reuse else None
+            if depth is not None:
+                tracer.count('depth_reused')
+                with tracer.span('bucketing'):
+                    return run_offloaded(self.offload, self.bucketer, depth)
+
+        with tracer.span('transform'):
+            input_batch = run_offloaded(self.offload, self.transform_image, img)
+
+        # Depth estimation
+        tracer.count('depth_inferences')
+        with tracer.span('midas'):
+            prediction = self.depth_batcher.infer(input_batch)
+        if not self.native_depth_resolution:
+            with tracer.span('interpolate'):
+                prediction = run_offloaded(self.offload, self.interpolate, prediction, img.shape[:2])
+
+        output = prediction.squeeze().cpu().numpy()
+        if probe is not None:
+            self.temporal_depth.keyframe(session_id, probe, output)
+
+        # Average forward space per angle bucket (cached pixel grid + single bincount reduction)
+        with tracer.span('bucketing'):
+            return run_offloaded(self.offload, self.bucketer, output)
+
+    # Resize image for depth processing (smaller size for faster processing)
+    def transform_image(self, img: np.ndarray) -> torch.Tensor:
+        img_small = cv2.resize(img, (256, 256))
+        img_small = cv2.cvtColor(img_small, cv2.COLOR_BGR2RGB)
+        return self.transform(img_small).to(device)
+
+    # Upsamples a (1, H, W) MiDaS prediction to the working resolution
+    @staticmethod
+    def interpolate(prediction: torch.Tensor, size: tuple) -> torch.Tensor:
+        with torch.no_grad():
+            return torch.nn.functional.interpolate(
+                prediction.unsqueeze(1),
+                size=size,
+                mode="bicubic",
+                align_corners=False,
+            )
+
+    def warm_up(self):
+        """Run one depth inference on a dummy frame so the first real request isn't slow"""
+        with tracer.span('warm_up'):
+            self.depth_buckets(np.zeros((600, 600, 3), dtype=np.uint8))
+
+    def stats(self) -> dict:
+        """Batch occupancy stats for the depth inference worker, plus temporal reuse when enabled"""
+        stats = self.depth_batcher.stats()
+        if self.temporal_depth is not None:
+            stats['temporal'] = self.temporal_depth.stats()
+        return stats
+
+    def drop(self, session_id):
+        """Forget a disconnected session's depth keyframe"""
+        if self.temporal_depth is not None:
+            self.temporal_depth.drop(session_id)
@@ -0,0 +1,259 @@
+"""
+Out-of-process depth inference shared by several web workers.
+
+One server process owns a DepthPipeline (MiDaS, the DepthBatcher and the temporal depth cache) and
+nothing else, so the inference host needs no Gemini key. Web workers keep Gemini, ASR and the
+Socket.IO traffic, and only send frames here:
+
+    python depth_server.py --socket /tmp/yeongsil-depth.sock --threads 4 --cpus 0-3
+    YEONGSIL_DEPTH_SERVER=/tmp/yeongsil-depth.sock python app.py     # RemoteYeongSil, no model loaded
+
+Pixel data never goes through the socket: each pooled client connection owns a
+multiprocessing.shared_memory block the client writes the 600x600 BGR frame into, and the server
+runs the pipeline on an ndarray view of that same memory. Only small length-prefixed JSON messages
+(frame shape, session id, the depth buckets) travel over the Unix socket, which is made mode 0600
+so only the server's own user can connect. Requests from all connections meet in the server's
+DepthBatcher, so frames from different workers share forward passes.
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from tracing import tracer
+
+DEFAULT_ADDRESS = '/tmp/yeongsil-depth.sock'
+_HEADER = struct.Struct('!I')
+MAX_MESSAGE_BYTES = 1 << 20
+
+
+class DepthServerError(Exception):
+    """The depth server could not be reached or failed the request"""
+
+
+def _send(sock: socket.socket, message):
+    payload = json.dumps(message).encode()
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < n:
+        chunk = sock.recv(n - len(buffer))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        buffer += chunk
+    return bytes(buffer)
+
+
+def _recv(sock: socket.socket):
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if length > MAX_MESSAGE_BYTES:
+        raise ConnectionError(f"Message of {length} bytes exceeds the {MAX_MESSAGE_BYTES} byte limit")
+    return json.loads(_recv_exact(sock, length))
+
+
+class _DepthRequestHandler(socketserver.BaseRequestHandler):
+    """One thread per client connection, serving its requests in order against its shared memory block"""
+
+    def setup(self):
+        self.shm = None
+
+    def handle(self):
+        while True:
+            try:
+                request = _recv(self.request)
+            except (ConnectionError, OSError, ValueError):
+                return
+            try:
+                reply = ['ok', self.dispatch(*request)]
+            except Exception as e:
+                reply = ['error', f"{type(e).__name__}: {e}"]
+            _send(self.request, reply)
+
+    def dispatch(self, op: str, *args):
+        pipeline = self.server.pipeline
+        if op == 'attach':
+            self.detach()
+            self.shm = shared_memory.SharedMemory(name=args[0])
+            # The client created and unlinks the block; without this our resource tracker would unlink it too
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+            return None
+        if op == 'depth':
+            shape, session_id, reuse = args
+            if self.shm is None or len(shape) != 3 or shape[2] != 3 or int(np.prod(shape)) > self.shm.size:
+                raise ValueError(f"Frame of shape {shape} does not fit the attached shared memory")
+            img = np.ndarray(tuple(shape), dtype=np.uint8, buffer=self.shm.buf)
+            try:
+                with tracer.span('depth_request'):
+                    return [float(bucket) for bucket in pipeline.depth_buckets(img, session_id, reuse)]
+            finally:
+                del img  # release the view so the block can be closed on re-attach
+        if op == 'drop':
+            pipeline.drop(args[0])
+            return None
+        if op == 'stats':
+            return pipeline.stats()
+        raise ValueError(f"Unknown depth server request '{op}'")
+
+    def detach(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm = None
+
+    def finish(self):
+        self.detach()
+
+
+class DepthServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, **pipeline_kwargs):
+        from depth_pipeline import DepthPipeline  # torch is only needed on the serving side
+
+        if os.path.exists(address):
+            os.unlink(address)
+        self.pipeline = DepthPipeline(**pipeline_kwargs)
+        self.pipeline.warm_up()
+        # Owner-only from the moment it is bound (umask), and explicitly afterwards
+        umask = os.umask(0o177)
+        try:
+            super().__init__(address, _DepthRequestHandler)
+        finally:
+            os.umask(umask)
+        os.chmod(address, 0o600)
+
+
+class _Channel:
+    """One connection to the server plus the shared memory block its frames travel in"""
+
+    def __init__(self, address: str, timeout: float):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+        self.shm = None
+
+    def request(self, *message):
+        _send(self.sock, list(message))
+        status, value = _recv(self.sock)
+        if status != 'ok':
+            raise DepthServerError(value)
+        return value
+
+    def write_frame(self, img: np.ndarray):
+        if self.shm is None or self.shm.size < img.nbytes:
+            self.release()
+            self.shm = shared_memory.SharedMemory(create=True, size=img.nbytes)
+            self.request('attach', self.shm.name)
+        np.copyto(np.ndarray(img.shape, dtype=np.uint8, buffer=self.shm.buf), img)
+
+    def release(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        self.release()
+        self.sock.close()
+
+
+class DepthClient:
+    """Client side of the depth server, with the same depth_buckets/stats/drop interface as a local
+    DepthPipeline: a 600x600 BGR frame in, 18 depth buckets out. Up to `connections` requests from
+    one worker are in flight at a time."""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, connections: int = 4, timeout: float = 30.0):
+        self.address = address
+        self.timeout = timeout
+        self._pool = queue.Queue()
+        try:
+            for _ in range(connections):
+                self._pool.put(_Channel(address, timeout))
+        except OSError as e:
+            self.close()
+            raise DepthServerError(f"Depth server not reachable at {address}: {e}")
+
+    def _call(self, fn):
+        channel = self._pool.get()
+        try:
+            return fn(channel)
+        except (OSError, ConnectionError) as e:
+            # The connection is in an unknown state (server restarted, timeout); replace it
+            channel.close()
+            try:
+                channel = _Channel(self.address, self.timeout)
+            except OSError:
+                pass
+            raise DepthServerError(f"Depth server request failed: {e}")
+        finally:
+            self._pool.put(channel)
+
+    def depth_buckets(self, img: np.ndarray, session_id=None, reuse: bool = False) -> list[float]:
+        img = np.ascontiguousarray(img, dtype=np.uint8)
+
+        def request(channel):
+            channel.write_frame(img)
+            return channel.request('depth', list(img.shape), session_id, reuse)
+        return self._call(request)
+
+    def drop(self, session_id):
+        self._call(lambda channel: channel.request('drop', session_id))
+
+    def stats(self) -> dict:
+        return self._call(lambda channel: channel.request('stats'))
+
+    def warm_up(self):
+        """One round trip with a dummy frame; the server warmed its own model up before listening"""
+        with tracer.span('warm_up'):
+            self.depth_buckets(np.zeros((600, 600, 3), dtype=np.uint8))
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+def parse_cpus(spec: str) -> set[int]:
+    """'0-3,6' -> {0, 1, 2, 3, 6}"""
+    cpus = set()
+    for part in spec.split(','):
+        first, _, last = part.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shared MiDaS depth inference server for YeongSil web workers')
+    parser.add_argument('--socket', default=os.environ.get('YEONGSIL_DEPTH_SERVER', DEFAULT_ADDRESS))
+    parser.add_argument('--depth-backend', default=os.environ.get('YEONGSIL_DEPTH_BACKEND', 'torch'))
+    parser.add_argument('--no-temporal-depth', action='store_true', help='run MiDaS on every frame')
+    parser.add_argument('--max-batch-size', type=int, default=8)
+    parser.add_argument('--threads', type=int, help='torch intra-op threads')
+    parser.add_argument('--cpus', help='pin the process to these cores, e.g. 0-3')
+    parser.add_argument('--log-requests', action='store_true', help='print a timing line per request')
+    args = parser.parse_args()
+
+    if args.cpus:
+        os.sched_setaffinity(0, parse_cpus(args.cpus))
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    tracer.log_spans = args.log_requests
+    server = DepthServer(args.socket, depth_backend=args.depth_backend, max_batch_size=args.max_batch_size,
+                         temporal_depth=not args.no_temporal_depth)
+    print(f"🧠 Depth server listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
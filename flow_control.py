@@ -0,0 +1,69 @@
+import time
+
+# Capture settings advertised to clients, from most to least demanding
+FLOW_LEVELS = (
+    {'frame_interval_ms': 1000, 'jpeg_quality': 0.6, 'max_width': 640, 'audio_chunk_ms': 2000},
+    {'frame_interval_ms': 2000, 'jpeg_quality': 0.5, 'max_width': 640, 'audio_chunk_ms': 2000},
+    {'frame_interval_ms': 3000, 'jpeg_quality': 0.5, 'max_width': 480, 'audio_chunk_ms': 2500},
+    {'frame_interval_ms': 5000, 'jpeg_quality': 0.4, 'max_width': 320, 'audio_chunk_ms': 3000},
+)
+# Sessions that are not listening only send an occasional small frame and no audio
+KEEPALIVE = {'frame_interval_ms': 15000, 'jpeg_quality': 0.4, 'max_width': 320, 'audio_chunk_ms': 0}
+
+
+class FlowController:
+    """Chooses per-session capture settings from server load.
+
+    Load is the larger of queue depth per worker and recent job latency over target_latency. Above 1
+    a session steps one level down in cadence/quality, below 0.5 it steps one level back up; at most
+    one step per hold seconds so the client timers do not oscillate.
+
+    Sessions running the obstacle monitor get frames up to twice as often as their level, but no
+    more often than the monitor checks them, so load keeps slowing their frames (and checks) down.
+    """
+
+    def __init__(self, workers: int = 2, target_latency: float = 4.0, hold: float = 3.0, start_level: int = 2):
+        self.workers = max(1, workers)
+        self.target_latency = target_latency
+        self.hold = hold
+        self.start_level = start_level
+        self.changes = 0
+
+    def load(self, queue_depth: int, latency: float) -> float:
+        return max(queue_depth / self.workers, latency / self.target_latency)
+
+    def update(self, state: dict, listening: bool, queue_depth: int, latency: float,
+               monitor_interval_ms: int = None) -> dict:
+        """Advance a session's flow state; returns the settings to advertise when they changed, else None.
+        monitor_interval_ms is the obstacle monitor's check interval when the session is monitored."""
+        now = time.monotonic()
+        if not state:
+            state.update(level=self.start_level, changed_at=float('-inf'), advertised=None)
+
+        if listening and now - state['changed_at'] >= self.hold:
+            load = self.load(queue_depth, latency)
+            level = state['level']
+            if load > 1.0:
+                level = min(level + 1, len(FLOW_LEVELS) - 1)
+            elif load < 0.5:
+                level = max(level - 1, 0)
+            if level != state['level']:
+                state['level'] = level
+                state['changed_at'] = now
+
+        settings = dict(FLOW_LEVELS[state['level']], level=state['level']) if listening else dict(KEEPALIVE, level='keepalive')
+        if monitor_interval_ms is not None:
+            interval = settings['frame_interval_ms']
+            settings['frame_interval_ms'] = min(interval, max(monitor_interval_ms, interval // 2))
+        if settings == state['advertised']:
+            return None
+        state['advertised'] = settings
+        self.changes += 1
+        return settings
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'target_latency': self.target_latency,
+            'changes': self.changes,
+        }
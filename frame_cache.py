@@ -0,0 +1,84 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+def dhash(img: np.ndarray, hash_size: int = 8) -> int:
+    """64-bit difference hash of a BGR or grayscale frame"""
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(img, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def dhash_bytes(image_bytes: bytes, hash_size: int = 8) -> int:
+    """dHash straight from JPEG bytes, using libjpeg's cheap 1/8 scale grayscale decode"""
+    img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        raise ValueError("Could not decode image data")
+    return dhash(img, hash_size)
+
+
+class FrameSimilarityCache:
+    """Per-session cache of recent results keyed by perceptual hash.
+
+    A lookup hits when a result of the same kind ('guidance', 'text', ...) was stored for the same
+    session within ttl seconds and its frame hash is within max_distance bits of the new one.
+    """
+
+    def __init__(self, max_distance: int = 6, ttl: float = 10.0, entries_per_session: int = 4):
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.entries_per_session = entries_per_session
+        self._sessions = {}  # session -> list of (timestamp, kind, frame_hash, value), newest last
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_distance >= 0
+
+    def lookup(self, session, kind: str, frame_hash: int):
+        if not self.enabled or session is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entries = [e for e in self._sessions.get(session, []) if now - e[0] < self.ttl]
+            if entries:
+                self._sessions[session] = entries
+            else:
+                self._sessions.pop(session, None)
+
+            for timestamp, entry_kind, entry_hash, value in reversed(entries):
+                if entry_kind == kind and (entry_hash ^ frame_hash).bit_count() <= self.max_distance:
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def store(self, session, kind: str, frame_hash: int, value):
+        if not self.enabled or session is None:
+            return
+        with self._lock:
+            entries = self._sessions.setdefault(session, [])
+            entries.append((time.monotonic(), kind, frame_hash, value))
+            del entries[:-self.entries_per_session]
+
+    def drop(self, session):
+        """Forget everything cached for a session (e.g. on disconnect)"""
+        with self._lock:
+            self._sessions.pop(session, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'sessions': len(self._sessions),
+            }
@@ -0,0 +1,440 @@
+"""
+Socket.IO load generator: N simulated phones against one YeongSil server.
+
+Each phone replays the mobile_app.html protocol: start_continuous_mode (and optionally
+start_obstacle_monitor), camera frames on the binary 'frame' event (or base64 'frame_data' with
+--legacy-frames), back-to-back 16 kHz WAV 'audio_data' chunks stamped with start_ms, and scan/read
+commands spoken into that audio as offline_stubs.command_tone() tones. The server has to run with the
+offline stubs so nothing touches the network (--spawn starts it that way on --port):
+
+    YEONGSIL_ASR=stub YEONGSIL_STUB_GEMINI_LATENCY=0.8 YEONGSIL_LOG_FRAMES=0 YEONGSIL_DEBUG=0 python app.py
+
+    python loadgen.py --spawn --clients 20 --duration 60 --command-interval 15
+    python loadgen.py --spawn --server-mode async --clients 50
+    python loadgen.py --url http://localhost:8080 --server-pid 1234 --clients 50
+
+Command latency is measured from the end of the spoken command to voice_command_detected, to the
+first streamed guidance chunk and to the final result. Server CPU and RSS are sampled from /proc,
+summed over the server's process tree (Linux only).
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import wave
+
+import numpy as np
+import socketio
+
+from offline_stubs import command_tone, synthetic_frames
+
+SAMPLE_RATE = 16000
+
+
+def wav_bytes(pcm: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {'count': 0}
+    samples = np.array(values)
+    return {
+        'count': len(samples),
+        'p50': float(np.percentile(samples, 50)),
+        'p95': float(np.percentile(samples, 95)),
+        'p99': float(np.percentile(samples, 99)),
+        'max': float(samples.max()),
+    }
+
+
+class LoadStats:
+    """Counters and latency samples shared by every simulated phone"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {'connected': 0, 'connect_failed': 0, 'frames': 0, 'audio_chunks': 0, 'commands': 0,
+                       'detected': 0, 'completed': 0, 'queue_full': 0, 'errors': 0, 'obstacle_alerts': 0,
+                       'flow_updates': 0}
+        self.latency = {'detected': [], 'first_chunk': [], 'complete': []}
+
+    def add(self, name: str, n: int = 1):
+        with self._lock:
+            self.counts[name] += n
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.latency[stage].append(seconds)
+
+
+class SimulatedPhone(threading.Thread):
+    def __init__(self, index: int, url: str, stats: LoadStats, frames: list, args):
+        super().__init__(name=f'phone-{index}', daemon=True)
+        self.url = url
+        self.stats = stats
+        self.frames = frames
+        self.args = args
+        self.rng = random.Random(args.seed + index)
+        self.frame_interval = args.frame_interval
+        self.chunk_ms = args.audio_chunk_ms
+        self.utterances = []       # (start, end, phrase) on the wall clock timeline of the simulated mic
+        self.pending = []          # command records awaiting server replies, oldest first
+        self._lock = threading.Lock()
+
+    # Server replies are matched to the oldest outstanding command
+    def _oldest(self, predicate):
+        for command in self.pending:
+            if predicate(command):
+                return command
+        return None
+
+    def _finish(self, outcome: str):
+        now = time.time()
+        with self._lock:
+            command = self._oldest(lambda c: 'detected' in c) or self._oldest(lambda c: True)
+            if command is None:
+                return
+            self.pending.remove(command)
+        if outcome == 'complete':
+            self.stats.add('completed')
+            self.stats.record('complete', now - command['spoken_end'])
+
+    def _register(self, sio: socketio.Client):
+        @sio.on('voice_command_detected')
+        def on_detected(data):
+            now = time.time()
+            kind = 'read' if 'read' in data.get('command', '') else 'scan'
+            with self._lock:
+                command = self._oldest(lambda c: c['kind'] == kind and 'detected' not in c)
+                if command is not None:
+                    command['detected'] = now
+            if command is not None:
+                self.stats.add('detected')
+                self.stats.record('detected', now - command['spoken_end'])
+
+        @sio.on('guidance_chunk')
+        def on_chunk(data):
+            if data.get('index') != 0:
+                return
+            now = time.time()
+            with self._lock:
+                command = self._oldest(lambda c: 'detected' in c and c['kind'] == 'scan')
+            if command is not None:
+                self.stats.record('first_chunk', now - command['spoken_end'])
+
+        @sio.on('guidance_complete')
+        def on_complete(data):
+            self._finish('complete')
+
+        @sio.on('voice_analysis_result')
+        def on_result(data):
+            self._finish('complete')
+
+        @sio.on('voice_analysis_error')
+        def on_error(data):
+            self.stats.add('queue_full' if 'queue full' in data.get('error', '').lower() else 'errors')
+            self._finish('error')
+
+        @sio.on('voice_processing_error')
+        def on_processing_error(data):
+            self.stats.add('errors')
+
+        @sio.on('obstacle_alert')
+        def on_alert(data):
+            self.stats.add('obstacle_alerts')
+
+        @sio.on('flow_control')
+        def on_flow(data):
+            self.stats.add('flow_updates')
+            if self.args.follow_flow_control:
+                self.frame_interval = data['frame_interval_ms'] / 1000
+                if data['audio_chunk_ms']:
+                    self.chunk_ms = data['audio_chunk_ms']
+
+    def _mic(self, start: float, end: float) -> np.ndarray:
+        """Simulated microphone signal between two wall clock times: room noise plus any commands"""
+        n = int(round((end - start) * SAMPLE_RATE))
+        pcm = np.random.default_rng(self.rng.getrandbits(32)).normal(0, 60, n)
+        for u_start, u_end, phrase in self.utterances:
+            if u_end <= start or u_start >= end:
+                continue
+            tone = command_tone(phrase)
+            offset = int(round((u_start - start) * SAMPLE_RATE))
+            lo, hi = max(0, offset), min(n, offset + len(tone))
+            pcm[lo:hi] += tone[lo - offset:hi - offset]
+        return np.clip(pcm, -32768, 32767)
+
+    def _speak(self, now: float):
+        phrase = 'read this' if self.rng.random() < self.args.read_ratio else 'scan surroundings'
+        start = now + 0.1  # future audio, not yet part of any sent chunk
+        end = start + len(command_tone(phrase)) / SAMPLE_RATE
+        self.utterances.append((start, end, phrase))
+        with self._lock:
+            self.pending.append({'kind': 'read' if phrase.startswith('read') else 'scan', 'spoken_end': end})
+        self.stats.add('commands')
+
+    def run(self):
+        sio = socketio.Client(reconnection=False)
+        self._register(sio)
+        try:
+            sio.connect(self.url, wait_timeout=10)
+        except Exception as e:
+            print(f"❌ {self.name} could not connect: {e}")
+            self.stats.add('connect_failed')
+            return
+        self.stats.add('connected')
+
+        sio.emit('start_continuous_mode')
+        if self.args.obstacle_monitor:
+            sio.emit('start_obstacle_monitor')
+
+        t0 = time.time()
+        stop_at = t0 + self.args.duration
+        next_frame = t0 + self.rng.uniform(0, self.frame_interval)
+        next_command = t0 + self.rng.uniform(1, max(1.0, self.args.command_interval))
+        chunk_start = t0
+        frame_index = self.rng.randrange(len(self.frames))
+
+        while time.time() < stop_at and sio.connected:
+            now = time.time()
+            if now >= next_frame:
+                frame = self.frames[frame_index % len(self.frames)]
+                frame_index += 1
+                if self.args.legacy_frames:
+                    sio.emit('frame_data', {'frame': 'data:image/jpeg;base64,' + base64.b64encode(frame).decode()})
+                else:
+                    sio.emit('frame', frame)
+                self.stats.add('frames')
+                next_frame = now + self.frame_interval
+
+            if self.args.command_interval > 0 and now >= next_command:
+                self._speak(now)
+                next_command = now + self.rng.expovariate(1 / self.args.command_interval)
+
+            # Same cadence as the page: a chunk of chunk_ms is sent when it ends and the next one starts
+            # right after, once the recorder has restarted (a few ms of audio fall between the two)
+            chunk_len = self.chunk_ms / 1000
+            if now >= chunk_start + chunk_len:
+                pcm = self._mic(chunk_start, chunk_start + chunk_len)
+                sio.emit('audio_data', {
+                    'audio': base64.b64encode(wav_bytes(pcm)).decode(),
+                    'format': 'audio/wav',
+                    'start_ms': chunk_start * 1000,
+                })
+                self.stats.add('audio_chunks')
+                chunk_start += chunk_len + self.rng.uniform(0.005, 0.03)
+                self.utterances = [u for u in self.utterances if u[1] > chunk_start]
+            time.sleep(0.01)
+
+        # Let outstanding commands finish before hanging up
+        grace_until = time.time() + self.args.grace
+        while self.pending and time.time() < grace_until and sio.connected:
+            time.sleep(0.05)
+        sio.disconnect()
+
+
+class ProcessSampler(threading.Thread):
+    """Samples CPU and RSS of a process and all of its descendants once per interval (Linux /proc)"""
+
+    def __init__(self, pid: int, interval: float = 1.0):
+        super().__init__(name='process-sampler', daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.ticks = os.sysconf('SC_CLK_TCK')
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+        self.cpu_percent = []
+        self.rss_mb = []
+        self._stopped = threading.Event()
+
+    def _tree(self) -> list[int]:
+        parents = {}
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                try:
+                    with open(f'/proc/{entry}/stat') as f:
+                        parents[int(entry)] = int(f.read().rsplit(')', 1)[1].split()[1])
+                except (OSError, IndexError, ValueError):
+                    continue
+        tree, frontier = [self.pid], [self.pid]
+        while frontier:
+            children = [pid for pid, ppid in parents.items() if ppid in frontier]
+            tree += children
+            frontier = children
+        return tree
+
+    def _sample(self) -> tuple[float, float]:
+        cpu, rss = 0.0, 0.0
+        for pid in self._tree():
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                with open(f'/proc/{pid}/statm') as f:
+                    resident = int(f.read().split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            cpu += (int(fields[11]) + int(fields[12])) / self.ticks  # utime + stime
+            rss += resident * self.page_size / (1024 * 1024)
+        return cpu, rss
+
+    def run(self):
+        last_cpu, last_time = self._sample()[0], time.monotonic()
+        while not self._stopped.wait(self.interval):
+            cpu, rss = self._sample()
+            now = time.monotonic()
+            self.cpu_percent.append(100 * (cpu - last_cpu) / (now - last_time))
+            self.rss_mb.append(rss)
+            last_cpu, last_time = cpu, now
+
+    def stop(self) -> dict:
+        self._stopped.set()
+        return {
+            'cpu_percent_mean': float(np.mean(self.cpu_percent)) if self.cpu_percent else None,
+            'cpu_percent_peak': float(np.max(self.cpu_percent)) if self.cpu_percent else None,
+            'rss_mb_peak': float(np.max(self.rss_mb)) if self.rss_mb else None,
+        }
+
+
+def fetch_json(url: str, timeout: float = 5.0):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def spawn_server(args) -> subprocess.Popen:
+    """Start app.py with the offline stubs and wait until YeongSil has warmed up"""
+    env = dict(os.environ,
+               YEONGSIL_ASR='stub',
+               YEONGSIL_STUB_GEMINI_LATENCY=str(args.gemini_latency),
+               YEONGSIL_STUB_ASR_LATENCY=str(args.asr_latency),
+               YEONGSIL_LOG_FRAMES='0',
+               YEONGSIL_PORT=str(args.port),
+               YEONGSIL_SERVER_MODE=args.server_mode,
+               YEONGSIL_DEBUG='0')  # no reloader parent process skewing the RSS samples
+    log = open(args.server_log, 'w')
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')],
+                              env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}, see {args.server_log}")
+        try:
+            health = fetch_json(f'{args.url}/health', timeout=1.0)
+            if health.get('yeongsil_ready'):
+                return server
+            if health.get('yeongsil_state') == 'failed':
+                raise RuntimeError(f"YeongSil failed to initialize, see {args.server_log}")
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server not ready after {args.startup_timeout:.0f}s, see {args.server_log}")
+
+
+def run(args) -> dict:
+    server = spawn_server(args) if args.spawn else None
+    server_pid = server.pid if server else args.server_pid
+    sampler = ProcessSampler(server_pid) if server_pid and os.path.isdir('/proc') else None
+    try:
+        stats = LoadStats()
+        frames = synthetic_frames()
+        if sampler:
+            sampler.start()
+
+        phones = [SimulatedPhone(i, args.url, stats, frames, args) for i in range(args.clients)]
+        start = time.time()
+        for phone in phones:
+            phone.start()
+            time.sleep(args.ramp_up / max(1, args.clients))
+        for phone in phones:
+            phone.join()
+        elapsed = time.time() - start
+
+        missing = sum(len(phone.pending) for phone in phones)
+        try:
+            health = fetch_json(f'{args.url}/health')
+        except OSError:
+            health = {}
+        return {
+            'clients': args.clients,
+            'duration': elapsed,
+            'counts': dict(stats.counts, missing=missing),
+            'throughput': {
+                'frames_per_s': stats.counts['frames'] / elapsed,
+                'audio_chunks_per_s': stats.counts['audio_chunks'] / elapsed,
+                'commands_completed_per_s': stats.counts['completed'] / elapsed,
+            },
+            'latency': {stage: percentiles(values) for stage, values in stats.latency.items()},
+            'server': sampler.stop() if sampler else None,
+            'scheduler': health.get('scheduler'),
+        }
+    finally:
+        if server is not None:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait(timeout=10)
+
+
+def print_report(report: dict):
+    counts = report['counts']
+    print(f"📱 {report['clients']} clients for {report['duration']:.0f}s "
+          f"({counts['connected']} connected, {counts['connect_failed']} failed)")
+    print(f"📤 sent {counts['frames']} frames ({report['throughput']['frames_per_s']:.1f}/s), "
+          f"{counts['audio_chunks']} audio chunks ({report['throughput']['audio_chunks_per_s']:.1f}/s), "
+          f"{counts['commands']} commands")
+    print(f"✅ detected {counts['detected']}, completed {counts['completed']} "
+          f"({report['throughput']['commands_completed_per_s']:.2f}/s), queue full {counts['queue_full']}, "
+          f"errors {counts['errors']}, unanswered {counts['missing']}, obstacle alerts {counts['obstacle_alerts']}")
+    for stage, stats in report['latency'].items():
+        if stats['count']:
+            print(f"⏱️ {stage:12s} p50 {stats['p50']:.2f}s  p95 {stats['p95']:.2f}s  p99 {stats['p99']:.2f}s  "
+                  f"max {stats['max']:.2f}s  (n={stats['count']})")
+    if report['server']:
+        server = report['server']
+        print(f"🖥️ server CPU mean {server['cpu_percent_mean'] or 0:.0f}%  peak {server['cpu_percent_peak'] or 0:.0f}%  "
+              f"RSS peak {server['rss_mb_peak'] or 0:.0f} MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate many phones against a YeongSil server (offline stubs)')
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds each client stays active')
+    parser.add_argument('--ramp-up', type=float, default=5.0, help='seconds over which clients connect')
+    parser.add_argument('--frame-interval', type=float, default=3.0, help='seconds between frames')
+    parser.add_argument('--audio-chunk-ms', type=int, default=2000)
+    parser.add_argument('--command-interval', type=float, default=20.0, help='mean seconds between commands (0 = none)')
+    parser.add_argument('--read-ratio', type=float, default=0.3, help='share of commands that are "read"')
+    parser.add_argument('--obstacle-monitor', action='store_true', help='also start obstacle monitoring')
+    parser.add_argument('--follow-flow-control', action='store_true', help='adopt advertised frame/audio cadence')
+    parser.add_argument('--legacy-frames', action='store_true', help='send base64 frame_data instead of binary frames')
+    parser.add_argument('--grace', type=float, default=15.0, help='seconds to wait for outstanding replies')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help='server URL (default http://127.0.0.1:PORT)')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--server-pid', type=int, help='sample CPU/RSS of an already running server')
+    parser.add_argument('--spawn', action='store_true', help='start app.py with stubbed Gemini/ASR on --port')
+    parser.add_argument('--gemini-latency', type=float, default=0.8, help='stubbed Gemini seconds per request')
+    parser.add_argument('--server-mode', choices=('dev', 'async'), default='dev', help='serving mode for --spawn')
+    parser.add_argument('--asr-latency', type=float, default=0.2, help='stubbed ASR seconds per utterance')
+    parser.add_argument('--startup-timeout', type=float, default=180.0)
+    parser.add_argument('--server-log', default='loadgen_server.log')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+    args.url = args.url or f'http://127.0.0.1:{args.port}'
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
@@ -0,0 +1,177 @@
+"""
+Local artifact cache for the MiDaS depth model.
+
+torch.hub resolves the intel-isl/MiDaS repo (and possibly hits the network) every time the
+server starts. This module keeps a pinned TorchScript export of MiDaS_small plus a manifest in a
+local directory, so the model can be loaded with torch.jit.load and no hub code at all.
+
+The cache can also hold an ONNX export and a dynamically quantized INT8 ONNX model for the
+alternative depth backends in depth_backends.py.
+
+Populate the cache once (needs network):
+    python model_cache.py [--dir models] [--onnx]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+import torch
+
+MIDAS_HUB_REPO = "intel-isl/MiDaS"
+MIDAS_MODEL = "MiDaS_small"
+MIDAS_INPUT_SIZE = 256
+
+MODEL_CACHE_DIR = os.environ.get(
+    'YEONGSIL_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+MODEL_FILE = 'midas_small.pt'
+ONNX_FILE = 'midas_small.onnx'
+ONNX_INT8_FILE = 'midas_small.int8.onnx'
+MANIFEST_FILE = 'manifest.json'
+
+# ImageNet normalisation used by MiDaS' small_transform
+_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+def _constrain_to_multiple_of(x: float, multiple: int = 32, max_val: int = None) -> int:
+    y = int(np.round(x / multiple) * multiple)
+    if max_val is not None and y > max_val:
+        y = int(np.floor(x / multiple) * multiple)
+    return y
+
+
+def midas_small_transform(img: np.ndarray) -> torch.Tensor:
+    """Hub-free equivalent of MiDaS' small_transform for an RGB uint8 image"""
+    height, width = img.shape[:2]
+
+    # Resize(256, 256, keep_aspect_ratio=True, ensure_multiple_of=32, resize_method="upper_bound")
+    scale = min(MIDAS_INPUT_SIZE / height, MIDAS_INPUT_SIZE / width)
+    new_h = _constrain_to_multiple_of(scale * height, max_val=MIDAS_INPUT_SIZE)
+    new_w = _constrain_to_multiple_of(scale * width, max_val=MIDAS_INPUT_SIZE)
+
+    image = img / 255.0
+    if (new_h, new_w) != (height, width):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
+
+    # NormalizeImage + PrepareForNet
+    image = (image - _MEAN) / _STD
+    image = np.ascontiguousarray(np.transpose(image, (2, 0, 1)).astype(np.float32))
+    return torch.from_numpy(image).unsqueeze(0)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(cache_dir: str = MODEL_CACHE_DIR):
+    path = os.path.join(cache_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def artifact_path(name: str, cache_dir: str = MODEL_CACHE_DIR, verify: bool = True):
+    """Path of a cached artifact ('torchscript', 'onnx' or 'onnx_int8'), or None if it isn't cached"""
+    manifest = load_manifest(cache_dir)
+    if manifest is None or name not in manifest['artifacts']:
+        return None
+    entry = manifest['artifacts'][name]
+    path = os.path.join(cache_dir, entry['file'])
+    if not os.path.exists(path):
+        return None
+    if verify and _sha256(path) != entry['sha256']:
+        raise RuntimeError(f"MiDaS artifact checksum mismatch: {path}")
+    return path
+
+
+def is_cached(cache_dir: str = MODEL_CACHE_DIR) -> bool:
+    return artifact_path('torchscript', cache_dir, verify=False) is not None
+
+
+def load_hub_midas(device: torch.device):
+    """Eager MiDaS_small and its transform straight from torch.hub (may hit the network)"""
+    midas_transforms = torch.hub.load(MIDAS_HUB_REPO, "transforms")
+    model = torch.hub.load(MIDAS_HUB_REPO, MIDAS_MODEL)
+    model.to(device)
+    model.eval()
+    return midas_transforms.small_transform, model
+
+
+def export_midas(cache_dir: str = MODEL_CACHE_DIR, onnx: bool = False) -> dict:
+    """Download MiDaS_small through torch.hub once and store exports of it in cache_dir"""
+    os.makedirs(cache_dir, exist_ok=True)
+    _, model = load_hub_midas(torch.device('cpu'))
+
+    example = torch.zeros(1, 3, MIDAS_INPUT_SIZE, MIDAS_INPUT_SIZE)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example, check_trace=False)
+    traced.save(os.path.join(cache_dir, MODEL_FILE))
+    files = {'torchscript': MODEL_FILE}
+
+    if onnx:
+        torch.onnx.export(
+            model, example, os.path.join(cache_dir, ONNX_FILE),
+            input_names=['image'], output_names=['depth'],
+            dynamic_axes={'image': {0: 'batch'}, 'depth': {0: 'batch'}},
+            opset_version=17,
+        )
+        files['onnx'] = ONNX_FILE
+
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(os.path.join(cache_dir, ONNX_FILE), os.path.join(cache_dir, ONNX_INT8_FILE),
+                         weight_type=QuantType.QUInt8)
+        files['onnx_int8'] = ONNX_INT8_FILE
+
+    manifest = {
+        'model': MIDAS_MODEL,
+        'hub_repo': MIDAS_HUB_REPO,
+        'input_size': MIDAS_INPUT_SIZE,
+        'torch_version': torch.__version__,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'artifacts': {
+            name: {'file': file, 'sha256': _sha256(os.path.join(cache_dir, file))}
+            for name, file in files.items()
+        },
+    }
+    with open(os.path.join(cache_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_midas(device: torch.device, cache_dir: str = MODEL_CACHE_DIR, allow_hub: bool = True):
+    """Return (transform, model) for MiDaS_small, preferring the local artifact cache.
+
+    Falls back to torch.hub when nothing is cached and allow_hub is set.
+    """
+    model_path = artifact_path('torchscript', cache_dir)
+    if model_path is not None:
+        model = torch.jit.load(model_path, map_location=device)
+        model.eval()
+        print(f"📦 Loaded {MIDAS_MODEL} from local cache {cache_dir}")
+        return midas_small_transform, model
+
+    if not allow_hub:
+        raise RuntimeError(f"No cached MiDaS artifact in {cache_dir}; run `python model_cache.py` first")
+
+    print("🌐 No local MiDaS artifact, loading from torch.hub...")
+    return load_hub_midas(device)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Populate the local MiDaS artifact cache')
+    parser.add_argument('--dir', default=MODEL_CACHE_DIR, help='cache directory')
+    parser.add_argument('--onnx', action='store_true', help='also export ONNX and INT8-quantized ONNX models')
+    args = parser.parse_args()
+
+    manifest = export_midas(args.dir, onnx=args.onnx)
+    print(json.dumps(manifest, indent=2))
@@ -0,0 +1,89 @@
+import time
+
+import numpy as np
+
+# Bucket i of the depth table covers [-90 + 10 * i, -80 + 10 * i) degrees; negative angles are to the left
+FORWARD_BUCKETS = slice(7, 11)   # -20 .. 20 degrees
+LEFT_BUCKETS = slice(4, 7)       # -50 .. -20 degrees
+RIGHT_BUCKETS = slice(11, 14)    # 20 .. 50 degrees
+
+
+class MonitorState:
+    """Per-session obstacle monitor state"""
+    __slots__ = ('smoothed', 'last_run', 'blocked', 'last_alert', 'checks', 'alerts')
+
+    def __init__(self):
+        self.smoothed = None
+        self.last_run = float('-inf')
+        self.blocked = False
+        self.last_alert = float('-inf')
+        self.checks = 0
+        self.alerts = 0
+
+    def to_dict(self) -> dict:
+        return {'blocked': self.blocked, 'checks': self.checks, 'alerts': self.alerts}
+
+
+class ObstacleMonitor:
+    """Continuous safety check on depth buckets alone (local MiDaS, no Gemini).
+
+    Each session is checked at most rate times per second. Bucket values are smoothed with an
+    exponential moving average so a single noisy depth map does not trigger an alert. A 'warning'
+    alert is sent when the smoothed forward free space drops below threshold (same units as the
+    depth table given to Gemini), repeated at most every repeat_after seconds while it stays
+    blocked, and a 'clear' alert once it rises back above threshold * clear_ratio.
+    """
+
+    def __init__(self, rate: float = 2.0, threshold: float = 25.0, smoothing: float = 0.5,
+                 clear_ratio: float = 1.15, repeat_after: float = 5.0):
+        self.interval = 1.0 / rate
+        self.threshold = threshold
+        self.smoothing = smoothing
+        self.clear_ratio = clear_ratio
+        self.repeat_after = repeat_after
+        self.skipped = 0
+
+    def due(self, state: MonitorState) -> bool:
+        """Rate limit: True (and the slot is taken) when the session may run another check"""
+        now = time.monotonic()
+        if now - state.last_run < self.interval:
+            self.skipped += 1
+            return False
+        state.last_run = now
+        return True
+
+    def update(self, state: MonitorState, depth_buckets: list[float]):
+        """Fold a new set of depth buckets into the session; returns an alert dict or None"""
+        buckets = np.asarray(depth_buckets, dtype=np.float32)
+        if state.smoothed is None:
+            state.smoothed = buckets
+        else:
+            state.smoothed = self.smoothing * buckets + (1 - self.smoothing) * state.smoothed
+        state.checks += 1
+
+        forward = float(state.smoothed[FORWARD_BUCKETS].min())
+        now = time.monotonic()
+        if forward < self.threshold:
+            if state.blocked and now - state.last_alert < self.repeat_after:
+                return None
+            state.blocked = True
+            state.last_alert = now
+            state.alerts += 1
+            left = float(state.smoothed[LEFT_BUCKETS].mean())
+            right = float(state.smoothed[RIGHT_BUCKETS].mean())
+            return {
+                'level': 'warning',
+                'free_space': round(forward, 1),
+                'clearer_side': 'left' if left > right else 'right',
+            }
+        if state.blocked and forward > self.threshold * self.clear_ratio:
+            state.blocked = False
+            return {'level': 'clear', 'free_space': round(forward, 1)}
+        return None
+
+    def stats(self) -> dict:
+        return {
+            'rate': 1.0 / self.interval,
+            'threshold': self.threshold,
+            'skipped': self.skipped,
+        }
@@ -0,0 +1,110 @@
+"""
+Local stand-ins for network services, for benchmarks and load tests that must run offline.
+
+    StubGeminiClient - drop-in for genai.Client (models.generate_content / generate_content_stream)
+                       with a configurable per-request latency; pass it as YeongSil(gemini_client=...)
+    StubAsrBackend   - ASR backend ('stub' mode) that "recognizes" the synthetic command tones made by
+                       command_tone(), so simulated clients exercise decode, VAD and endpointing for real
+    synthetic_frames - deterministic JPEG corpus
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from asr_backends import AsrBackend
+
+STUB_DESCRIPTION = 'Your view shows a hallway with a door on the far right and a chair in the middle. The floor ahead is clear.'
+STUB_GUIDANCE = 'Walk forward at 0 degrees for about three steps, then veer slightly left to pass the chair. The door is on your far right.'
+
+
+class _StubModels:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model: str, contents: list):
+        self._client._record()
+        time.sleep(self._client.latency)
+        return SimpleNamespace(text=self._client.reply_for(contents))
+
+    def generate_content_stream(self, model: str, contents: list):
+        self._client._record()
+        text = self._client.reply_for(contents)
+        pieces = text.split(' ')
+        # Spread the latency so the first piece arrives after a third of it, like a real stream
+        time.sleep(self._client.latency / 3)
+        for i, piece in enumerate(pieces):
+            time.sleep(2 * self._client.latency / 3 / len(pieces))
+            yield SimpleNamespace(text=piece if i == len(pieces) - 1 else piece + ' ')
+
+
+class StubGeminiClient:
+    """Answers every request with canned text after `latency` seconds"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.models = _StubModels(self)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def reply_for(contents: list) -> str:
+        # Requests that carry the image but no depth table are description requests
+        prompt = ' '.join(part for part in contents if isinstance(part, str))
+        return STUB_GUIDANCE if 'depth values' in prompt else STUB_DESCRIPTION
+
+    def _record(self):
+        with self._lock:
+            self.calls += 1
+
+
+# Simulated voice commands are pure tones; the stub recognizer maps the dominant frequency back to text
+COMMAND_TONES = {'scan surroundings': 440.0, 'read this': 880.0}
+
+
+def command_tone(phrase: str, sample_rate: int = 16000, duration: float = 0.8) -> np.ndarray:
+    """int16 tone standing in for a spoken command, with a smooth envelope like a voiced burst"""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    envelope = np.sin(np.pi * t / duration)
+    return (8000 * envelope * np.sin(2 * np.pi * COMMAND_TONES[phrase] * t)).astype(np.int16)
+
+
+class StubAsrBackend(AsrBackend):
+    name = 'stub'
+    local = False  # stands in for a cloud recognizer: its latency is a wait, not CPU work
+
+    def __init__(self, latency: float = 0.0, tolerance_hz: float = 30.0):
+        self.latency = latency
+        self.tolerance_hz = tolerance_hz
+
+    def transcribe(self, audio):
+        time.sleep(self.latency)
+        samples = np.frombuffer(audio.get_raw_data(convert_rate=16000, convert_width=2), dtype=np.int16)
+        if samples.size == 0:
+            return None
+        spectrum = np.abs(np.fft.rfft(samples.astype(np.float32)))
+        peak_hz = np.argmax(spectrum[1:]) + 1
+        peak_hz *= 16000 / samples.size
+        for phrase, tone in COMMAND_TONES.items():
+            if abs(peak_hz - tone) < self.tolerance_hz:
+                return phrase
+        return None
+
+
+def synthetic_frames(n: int = 6, seed: int = 0) -> list[bytes]:
+    """Indoor-like 640x480 JPEGs: floor/wall gradient with a few boxes (fixed seed, same bytes every run)"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(n):
+        img = np.zeros((480, 640, 3), dtype=np.uint8)
+        img[:] = np.linspace(200, 60, 480, dtype=np.uint8)[:, None, None]
+        for _ in range(rng.integers(2, 6)):
+            x, y = int(rng.integers(0, 560)), int(rng.integers(120, 420))
+            w, h = int(rng.integers(40, 200)), int(rng.integers(40, 160))
+            cv2.rectangle(img, (x, y), (x + w, y + h), [int(c) for c in rng.integers(0, 255, 3)], -1)
+        img = cv2.add(img, rng.integers(0, 20, img.shape, dtype=np.uint8))
+        frames.append(cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 50])[1].tobytes())
+    return frames
@@ -0,0 +1,13 @@
+"""
+Running CPU-bound steps off the calling thread.
+
+An offload hook is any offload(fn, *args) callable that runs fn(*args) somewhere else and returns
+its result, e.g. eventlet's tpool.execute so a green-thread server keeps serving I/O while MiDaS,
+decoding or hashing run on native threads. Offloaded steps must not take locks shared with the
+caller's threads: after monkey patching those are green locks, which a native thread cannot wait on.
+"""
+
+
+def run_offloaded(offload, fn, *args):
+    """Runs fn(*args) through the offload hook, or inline on the calling thread without one"""
+    return offload(fn, *args) if offload is not None else fn(*args)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def response_key(model: str, parts: list) -> str:
+    """Content address of a Gemini request: sha256 over the model name and every prompt/image part"""
+    digest = hashlib.sha256(model.encode())
+    for part in parts:
+        if isinstance(part, (bytes, bytearray, memoryview)):
+            digest.update(b'\x00bytes\x00')
+            digest.update(part)
+        else:
+            digest.update(b'\x00text\x00')
+            digest.update(str(part).encode())
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of Gemini response texts with a TTL and an optional on-disk tier.
+
+    The memory tier holds at most max_entries responses. When persist_dir is set every response is
+    also written there as a small JSON file, so identical requests are still served after a restart.
+    The disk tier holds at most max_disk_entries files: expired and then oldest files are pruned at
+    startup and whenever a write takes it over the limit (down to 90% of it, so pruning is rare).
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0, persist_dir: str = None,
+                 max_disk_entries: int = 4096):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_dir = persist_dir
+        self.max_disk_entries = max_disk_entries
+
+        self._entries = OrderedDict()  # key -> (created, text)
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_entries = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_pruned = 0
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+            self.prune_disk()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._put_memory(key, entry)
+        return entry[1]
+
+    def put(self, key: str, text: str):
+        entry = (time.time(), text)
+        with self._lock:
+            self._put_memory(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'disk_entries': self._disk_entries,
+                'disk_pruned': self.disk_pruned,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def _put_memory(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.persist_dir, f'{key}.json')
+
+    def _read_disk(self, key: str, now: float):
+        if not self.persist_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - data['created'] >= self.ttl:
+            try:
+                os.unlink(path)
+                with self._disk_lock:
+                    self._disk_entries -= 1
+            except OSError:
+                pass
+            return None
+        return data['created'], data['text']
+
+    def _write_disk(self, key: str, entry: tuple):
+        if not self.persist_dir:
+            return
+        path = self._path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            is_new = not os.path.exists(path)
+            with open(tmp_path, 'w') as f:
+                json.dump({'created': entry[0], 'text': entry[1]}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not persist Gemini response: {e}")
+            return
+        with self._disk_lock:
+            if is_new:
+                self._disk_entries += 1
+            over_limit = self._disk_entries > self.max_disk_entries
+        if over_limit:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """Delete expired files, then the oldest ones until the disk tier is at 90% of max_disk_entries"""
+        with self._disk_lock:
+            now = time.time()
+            files = []
+            for entry in os.scandir(self.persist_dir):
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    files.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+            files.sort()
+            keep = int(self.max_disk_entries * 0.9)
+            expired = sum(1 for mtime, _ in files if now - mtime >= self.ttl)
+            remove = files[:max(expired, len(files) - keep)]
+            for _, path in remove:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                self.disk_pruned += 1
+            self._disk_entries = len(files) - len(remove)
@@ -0,0 +1,181 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Priority lanes, lower runs first: navigation scans ahead of text reads, background obstacle checks last
+PRIORITY_SCAN = 0
+PRIORITY_READ = 1
+PRIORITY_MONITOR = 2
+LANE_NAMES = {PRIORITY_SCAN: 'scan', PRIORITY_READ: 'read', PRIORITY_MONITOR: 'monitor'}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    __slots__ = ('session_id', 'kind', 'priority', 'fn', 'seq', 'submitted_at', 'started_at', 'cancelled')
+
+    def __init__(self, session_id, kind: str, priority: int, fn, seq: int):
+        self.session_id = session_id
+        self.kind = kind
+        self.priority = priority
+        self.fn = fn
+        self.seq = seq
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class JobScheduler:
+    """Bounded worker pool for scans and text reads.
+
+    - at most max_queue jobs wait in total and max_per_session per session; a job that would exceed a limit
+      evicts the newest pending job of a lower-priority lane (so background monitor checks never keep scans
+      and reads out), and submit() raises QueueFull when there is none
+    - jobs run in priority order (PRIORITY_SCAN before PRIORITY_READ), FIFO within a lane
+    - a job submitted while the same session already has a pending job of the same kind is coalesced into it
+    - job functions receive the Job and should read the session's newest frame when they start, so a
+      scan queued behind others always runs on the latest frame rather than the one seen at submit time
+    - cancel_session() drops a session's pending jobs and flags its running ones (job.cancelled)
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 32, max_per_session: int = 2):
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        self._heap = []
+        self._pending = {}   # (session_id, kind) -> Job
+        self._running = set()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.evicted = 0
+        self._wait_times = deque(maxlen=1000)
+        self._latencies = deque(maxlen=1000)  # submit -> finish of completed jobs
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f'scheduler-{i}', daemon=True) for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, session_id, kind: str, fn, priority: int = PRIORITY_SCAN) -> Job:
+        with self._cond:
+            pending = self._pending.get((session_id, kind))
+            if pending is not None:
+                self.coalesced += 1
+                return pending
+
+            session_pending = [job for (sid, _), job in self._pending.items() if sid == session_id]
+            if len(self._pending) >= self.max_queue or len(session_pending) >= self.max_per_session:
+                # Make room from the session's own jobs when only its limit is hit, else from anyone's
+                candidates = self._pending.values() if len(self._pending) >= self.max_queue else session_pending
+                victim = max((job for job in candidates if job.priority > priority), default=None)
+                if victim is None:
+                    self.rejected += 1
+                    raise QueueFull(f"Processing queue full ({len(self._pending)} pending)")
+                del self._pending[(victim.session_id, victim.kind)]
+                victim.cancelled = True
+                self.evicted += 1
+
+            job = Job(session_id, kind, priority, fn, next(self._seq))
+            self._pending[(session_id, kind)] = job
+            heapq.heappush(self._heap, job)
+            self._cond.notify()
+            return job
+
+    def cancel_session(self, session_id):
+        """Drop pending jobs for a session and flag its running ones as cancelled"""
+        with self._cond:
+            for key in [key for key in self._pending if key[0] == session_id]:
+                self._pending.pop(key).cancelled = True
+                self.cancelled += 1
+            for job in self._running:
+                if job.session_id == session_id:
+                    job.cancelled = True
+
+    def queue_depth(self, session_id=None) -> int:
+        with self._cond:
+            if session_id is None:
+                return len(self._pending)
+            return sum(1 for sid, _ in self._pending if sid == session_id)
+
+    def recent_latency(self, n: int = 20) -> float:
+        """Mean submit-to-finish time of the last n jobs, in seconds"""
+        with self._cond:
+            recent = list(self._latencies)[-n:]
+        return sum(recent) / len(recent) if recent else 0.0
+
+    def stats(self) -> dict:
+        with self._cond:
+            lanes = {name: 0 for name in LANE_NAMES.values()}
+            for job in self._pending.values():
+                lane = LANE_NAMES.get(job.priority, str(job.priority))
+                lanes[lane] = lanes.get(lane, 0) + 1
+            waits = np.array(self._wait_times)
+            return {
+                'queue_depth': len(self._pending),
+                'lanes': lanes,
+                'running': len(self._running),
+                'workers': len(self._workers),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'coalesced': self.coalesced,
+                'cancelled': self.cancelled,
+                'evicted': self.evicted,
+                'wait_p50': float(np.percentile(waits, 50)) if len(waits) else 0.0,
+                'wait_p95': float(np.percentile(waits, 95)) if len(waits) else 0.0,
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                while self._heap:
+                    job = heapq.heappop(self._heap)
+                    if job.cancelled:
+                        continue
+                    self._pending.pop((job.session_id, job.kind), None)
+                    job.started_at = time.monotonic()
+                    self._wait_times.append(job.started_at - job.submitted_at)
+                    self._running.add(job)
+                    return job
+                if self._stopped:
+                    return None
+                self._cond.wait()
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                job.fn(job)
+                with self._cond:
+                    self.completed += 1
+            except Exception as e:
+                print(f"❌ Scheduled {job.kind} job failed: {e}")
+                with self._cond:
+                    self.failed += 1
+            finally:
+                with self._cond:
+                    self._running.discard(job)
+                    self._latencies.append(time.monotonic() - job.submitted_at)
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from speech_stream import StreamingSpeechBuffer
+from vad import VoiceActivityDetector
+
+
+class Frame:
+    """An encoded camera frame as received, plus its BGR ndarray decoded on first use and then reused"""
+    __slots__ = ('jpeg', 'received_at', '_image', '_lock')
+
+    def __init__(self, jpeg: bytes):
+        self.jpeg = jpeg
+        self.received_at = time.time()
+        self._image = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.jpeg)
+
+    @property
+    def image(self) -> np.ndarray:
+        with self._lock:
+            if self._image is None:
+                img = cv2.imdecode(np.frombuffer(self.jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if img is None:
+                    raise ValueError("Could not decode image data")
+                self._image = img
+            return self._image
+
+
+class ClientSession:
+    """Per-client state, keyed by Socket.IO sid"""
+    __slots__ = ('sid', 'latest_frame', 'frame_bytes', 'is_listening', 'audio_lock', 'vad',
+                 'speech_buffer', 'flow', 'monitor', 'connected_at', 'last_seen', 'stats')
+
+    def __init__(self, sid: str):
+        self.sid = sid
+        self.latest_frame = None          # most recent camera Frame (raw JPEG bytes, lazily decoded)
+        self.frame_bytes = 0              # size of latest_frame, counted against the registry's memory cap
+        self.is_listening = False
+        self.audio_lock = threading.Lock()
+        self.vad = VoiceActivityDetector()  # adaptive noise floor is tracked per client
+        self.speech_buffer = StreamingSpeechBuffer(self.vad)  # stitched audio stream, endpointed into utterances
+        self.flow = {}                    # flow-control level and the capture settings last advertised
+        self.monitor = None               # MonitorState while local obstacle monitoring is on
+        self.connected_at = time.time()
+        self.last_seen = self.connected_at
+        self.stats = {'frames': 0, 'frames_dropped': 0, 'audio_chunks': 0, 'scans': 0, 'reads': 0, 'errors': 0}
+
+    def to_dict(self) -> dict:
+        return {
+            'listening': self.is_listening,
+            'has_frame': self.latest_frame is not None,
+            'frame_bytes': self.frame_bytes,
+            'connected_for': time.time() - self.connected_at,
+            'vad': self.vad.stats(),
+            'speech': self.speech_buffer.stats(),
+            'flow': self.flow.get('advertised'),
+            'monitor': self.monitor.to_dict() if self.monitor else None,
+            **self.stats,
+        }
+
+
+class SessionRegistry:
+    """Thread-safe registry of ClientSession objects.
+
+    Bounded two ways: at most max_sessions sessions (least recently active ones are evicted), and
+    at most max_frame_bytes of stored frames across all sessions (frames of the least recently
+    active sessions are dropped first).
+    """
+
+    def __init__(self, max_sessions: int = 64, max_frame_bytes: int = 64 * 1024 * 1024):
+        self.max_sessions = max_sessions
+        self.max_frame_bytes = max_frame_bytes
+        self._sessions = OrderedDict()
+        self._frame_bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def get(self, sid: str) -> ClientSession:
+        """Return the session for sid, creating it if needed, and mark it as most recently active"""
+        with self._lock:
+            session = self._sessions.get(sid)
+            if session is None:
+                session = ClientSession(sid)
+                self._sessions[sid] = session
+                while len(self._sessions) > self.max_sessions:
+                    _, oldest = self._sessions.popitem(last=False)
+                    self._frame_bytes -= oldest.frame_bytes
+                    self.evicted += 1
+            else:
+                self._sessions.move_to_end(sid)
+            session.last_seen = time.time()
+            return session
+
+    def set_frame(self, session: ClientSession, frame: Frame):
+        """Store a frame in the session's slot, enforcing the global frame memory cap"""
+        size = len(frame) if frame is not None else 0
+        with self._lock:
+            self._frame_bytes += size - session.frame_bytes
+            session.latest_frame = frame
+            session.frame_bytes = size
+
+            for other in self._sessions.values():
+                if self._frame_bytes <= self.max_frame_bytes:
+                    break
+                if other is not session and other.latest_frame is not None:
+                    self._frame_bytes -= other.frame_bytes
+                    other.latest_frame = None
+                    other.frame_bytes = 0
+
+    def remove(self, sid: str):
+        with self._lock:
+            session = self._sessions.pop(sid, None)
+            if session is not None:
+                self._frame_bytes -= session.frame_bytes
+            return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def any_listening(self) -> bool:
+        with self._lock:
+            return any(session.is_listening for session in self._sessions.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'active': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'frame_bytes': self._frame_bytes,
+                'max_frame_bytes': self.max_frame_bytes,
+                'evicted': self.evicted,
+            }
@@ -0,0 +1,167 @@
+import numpy as np
+
+from vad import VoiceActivityDetector
+
+
+class StreamingSpeechBuffer:
+    """Per-session rolling PCM buffer that turns overlapping audio chunks into complete utterances.
+
+    Chunks are stitched onto the end of the buffer. Audio that was already received is dropped,
+    using the client's capture timestamp (start_ms) when it is sent, or a cross-correlation search
+    against the buffer tail otherwise. A gap between recordings shorter than endpoint_silence_ms
+    (the page restarting its recorder) is bridged with silence. Only newly added 20 ms frames are scored by the session's
+    VAD. An utterance opens on the first speech frame and is endpointed after endpoint_silence_ms
+    of silence (or at max_utterance_ms). Each finished utterance is returned once, so a command
+    that straddles a chunk boundary is recognized whole and fires exactly once.
+    """
+
+    def __init__(self, vad: VoiceActivityDetector = None, sample_rate: int = 16000, max_buffer_ms: int = 10000,
+                 endpoint_silence_ms: int = 400, pre_roll_ms: int = 200, max_utterance_ms: int = 4000,
+                 max_overlap_ms: int = 1500):
+        self.vad = vad or VoiceActivityDetector(sample_rate=sample_rate)
+        self.sample_rate = sample_rate
+        self.frame_len = self.vad.frame_len
+        self.max_buffer = sample_rate * max_buffer_ms // 1000
+        self.endpoint_frames = endpoint_silence_ms // self.vad.frame_ms
+        self.max_gap = sample_rate * endpoint_silence_ms // 1000
+        self.min_speech_frames = max(1, self.vad.min_speech_ms // self.vad.frame_ms)
+        self.max_utterance = sample_rate * max_utterance_ms // 1000
+        self.pre_roll = sample_rate * pre_roll_ms // 1000
+        self.max_overlap = sample_rate * max_overlap_ms // 1000
+
+        self.reset()
+        self.duplicate_samples = 0
+        self.speech_frames = 0
+        self.utterances = 0
+        self.short_utterances = 0  # opened by a noise burst but shorter than the VAD's min_speech_ms
+
+    def reset(self):
+        self._pcm = np.zeros(0, dtype=np.int16)
+        self._base = 0            # absolute sample index of _pcm[0]
+        self._scanned = 0         # absolute sample index up to which frames were VAD-scored
+        self._end_ms = None       # client timestamp of the end of the buffer
+        self._utt_start = None    # absolute sample index where the open utterance starts
+        self._speech_frames = 0
+        self._silence_run = 0
+
+    @property
+    def _end(self) -> int:
+        return self._base + len(self._pcm)
+
+    def feed(self, pcm: bytes, start_ms: float = None) -> list[bytes]:
+        """Add a decoded chunk; returns the PCM of every utterance that finished"""
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        finished = []
+
+        if start_ms is not None and self._end_ms is not None:
+            overlap = int(round((self._end_ms - start_ms) * self.sample_rate / 1000))
+            if -self.max_gap < overlap < 0:
+                # Short gap between recordings: pad it with silence so an open utterance carries on
+                samples = np.concatenate([np.zeros(-overlap, dtype=np.int16), samples])
+                start_ms = self._end_ms
+                overlap = 0
+            elif overlap < 0:
+                # Long gap in the stream: whatever was open cannot continue across it
+                finished += self._close_utterance(self._end)
+        else:
+            overlap = self._find_overlap(samples)
+        overlap = max(0, min(overlap, len(samples)))
+        self.duplicate_samples += overlap
+        new_samples = samples[overlap:]
+
+        if start_ms is not None:
+            self._end_ms = start_ms + 1000 * len(samples) / self.sample_rate
+        elif self._end_ms is not None:
+            self._end_ms += 1000 * len(new_samples) / self.sample_rate
+
+        speech_frames = self.speech_frames
+        if len(new_samples):
+            self._pcm = np.concatenate([self._pcm, new_samples])
+            finished += self._scan()
+            self._trim()
+        # Chunks of pure silence (most of them) never reach an utterance, let alone ASR
+        if self.speech_frames == speech_frames:
+            self.vad.gated += 1
+        else:
+            self.vad.passed += 1
+        return finished
+
+    def _scan(self) -> list[bytes]:
+        finished = []
+        n_frames = (self._end - self._scanned) // self.frame_len
+        if n_frames <= 0:
+            return finished
+        offset = self._scanned - self._base
+        speech = self.vad.speech_frames(self._pcm[offset:offset + n_frames * self.frame_len].tobytes())
+        self.speech_frames += int(np.count_nonzero(speech))
+
+        for i, is_speech in enumerate(speech):
+            frame_start = self._scanned + i * self.frame_len
+            frame_end = frame_start + self.frame_len
+            if is_speech:
+                if self._utt_start is None:
+                    self._utt_start = max(self._base, frame_start - self.pre_roll)
+                    self._speech_frames = 0
+                self._speech_frames += 1
+                self._silence_run = 0
+            elif self._utt_start is not None:
+                self._silence_run += 1
+
+            if self._utt_start is not None and (self._silence_run >= self.endpoint_frames
+                                                or frame_end - self._utt_start >= self.max_utterance):
+                finished += self._close_utterance(frame_end)
+
+        self._scanned += n_frames * self.frame_len
+        return finished
+
+    def _close_utterance(self, end: int) -> list[bytes]:
+        if self._utt_start is None:
+            return []
+        start, speech_frames = self._utt_start, self._speech_frames
+        self._utt_start = None
+        self._speech_frames = 0
+        self._silence_run = 0
+        if speech_frames < self.min_speech_frames:
+            self.short_utterances += 1
+            return []
+        self.utterances += 1
+        return [self._pcm[start - self._base:end - self._base].tobytes()]
+
+    def _trim(self):
+        # Keep at most max_buffer samples, but never drop the start of an open utterance
+        keep_from = self._end - self.max_buffer
+        if self._utt_start is not None:
+            keep_from = min(keep_from, self._utt_start)
+        keep_from = min(keep_from, self._scanned)
+        if keep_from > self._base:
+            self._pcm = self._pcm[keep_from - self._base:]
+            self._base = keep_from
+
+    def _find_overlap(self, samples: np.ndarray) -> int:
+        """Length of the longest prefix of samples that repeats the buffer tail (lossy-codec tolerant)"""
+        limit = min(len(self._pcm), len(samples), self.max_overlap)
+        step = self.frame_len
+        if limit < step * 5:
+            return 0
+        tail = self._pcm[-limit:].astype(np.float32)
+        head = samples[:limit].astype(np.float32)
+
+        best, best_corr = 0, 0.9
+        for length in range(limit - limit % step, step * 5 - 1, -step):
+            a, b = tail[-length:], head[:length]
+            denom = np.sqrt(np.dot(a, a) * np.dot(b, b))
+            if denom < 1e-3:
+                continue
+            corr = float(np.dot(a, b) / denom)
+            if corr > best_corr:
+                best, best_corr = length, corr
+        return best
+
+    def stats(self) -> dict:
+        return {
+            'buffered_ms': 1000 * len(self._pcm) / self.sample_rate,
+            'utterances': self.utterances,
+            'short_utterances': self.short_utterances,
+            'duplicate_ms': 1000 * self.duplicate_samples / self.sample_rate,
+            'in_utterance': self._utt_start is not None,
+        }
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class _Keyframe:
+    __slots__ = ('probe', 'depth', 'created_at', 'reused')
+
+    def __init__(self, probe: np.ndarray, depth: np.ndarray):
+        self.probe = probe
+        self.depth = depth
+        self.created_at = time.monotonic()
+        self.reused = 0
+
+
+class TemporalDepthCache:
+    """Per-session reuse of MiDaS depth maps across frames of a slowly moving camera.
+
+    Each frame is reduced to a small grayscale probe and its translation against the session's
+    last keyframe is measured with phase correlation (a few hundred microseconds). When the shift is
+    below max_shift (fraction of the frame) and the correlation peak is at least min_response, the
+    keyframe's depth map is translated by the same shift and reused. Full inference runs on the
+    first frame, when motion or confidence is out of range, after max_reuse reused frames and when
+    the keyframe is older than max_age seconds.
+
+    When a keyframe is forced by max_reuse/max_age although the warp would still have been
+    accepted, the warped map is compared with the fresh inference, which measures the drift
+    of reused depth against full inference at no extra cost.
+    """
+
+    def __init__(self, probe_size: int = 128, max_shift: float = 0.04, min_response: float = 0.3,
+                 max_reuse: int = 8, max_age: float = 3.0, max_sessions: int = 64):
+        self.probe_size = probe_size
+        self.max_shift = max_shift * probe_size
+        self.min_response = min_response
+        self.max_reuse = max_reuse
+        self.max_age = max_age
+        self.max_sessions = max_sessions
+        self._window = cv2.createHanningWindow((probe_size, probe_size), cv2.CV_32F)
+        self._keyframes = OrderedDict()
+        self._pending_drift = {}   # session_id -> warped depth awaiting comparison with the next keyframe
+        self._lock = threading.Lock()
+
+        self.keyframes = 0
+        self.reused = 0
+        self.rejected_motion = 0
+        self._drift = []
+
+    def probe(self, img: np.ndarray) -> np.ndarray:
+        """Small float32 grayscale version of a BGR frame used for motion estimation"""
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, (self.probe_size, self.probe_size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def lookup(self, session_id, probe: np.ndarray):
+        """Warped depth map from the session's keyframe, or None when full inference is needed"""
+        with self._lock:
+            keyframe = self._keyframes.get(session_id)
+        if keyframe is None:
+            return None
+
+        (dx, dy), response = cv2.phaseCorrelate(keyframe.probe, probe, self._window)
+        if response < self.min_response or np.hypot(dx, dy) > self.max_shift:
+            with self._lock:
+                self.rejected_motion += 1
+            return None
+
+        h, w = keyframe.depth.shape
+        scale_x, scale_y = w / self.probe_size, h / self.probe_size
+        shift = np.float32([[1, 0, dx * scale_x], [0, 1, dy * scale_y]])
+        warped = cv2.warpAffine(keyframe.depth, shift, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+        with self._lock:
+            if keyframe.reused >= self.max_reuse or time.monotonic() - keyframe.created_at > self.max_age:
+                self._pending_drift[session_id] = warped
+                return None
+            keyframe.reused += 1
+            self.reused += 1
+        return warped
+
+    def keyframe(self, session_id, probe: np.ndarray, depth: np.ndarray):
+        """Record a fully inferred depth map as the session's new keyframe"""
+        depth = np.ascontiguousarray(depth, dtype=np.float32)
+        with self._lock:
+            self.keyframes += 1
+            warped = self._pending_drift.pop(session_id, None)
+            if warped is not None and warped.shape == depth.shape:
+                self._drift.append(float(np.mean(np.abs(warped - depth)) / (np.mean(np.abs(depth)) + 1e-6)))
+                del self._drift[:-500]
+            self._keyframes[session_id] = _Keyframe(probe, depth)
+            self._keyframes.move_to_end(session_id)
+            while len(self._keyframes) > self.max_sessions:
+                evicted, _ = self._keyframes.popitem(last=False)
+                self._pending_drift.pop(evicted, None)
+
+    def drop(self, session_id):
+        with self._lock:
+            self._keyframes.pop(session_id, None)
+            self._pending_drift.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            frames = self.keyframes + self.reused
+            return {
+                'keyframes': self.keyframes,
+                'reused': self.reused,
+                'keyframe_ratio': self.keyframes / frames if frames else 0.0,
+                'rejected_motion': self.rejected_motion,
+                'drift_mean': float(np.mean(self._drift)) if self._drift else None,
+                'drift_p95': float(np.percentile(self._drift, 95)) if self._drift else None,
+                'drift_samples': len(self._drift),
+            }
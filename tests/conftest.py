@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules live at the repository root, next to scripts like test_voice_commands.py that need a
+# live server, so the automated tests sit in tests/ and import from the root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from depth_buckets import DepthBucketer
+
+
+def point_cloud_buckets(output: np.ndarray) -> list[float]:
+    """The original YeongSil implementation: a flipped point cloud, then a mask per bucket"""
+    h, w = output.shape
+    x_coords = np.flip(np.tile(np.arange(w), h)) / 40
+    x_coords = x_coords - x_coords.mean()
+    y_coords = -np.flip(output.flatten()) / 80 + 35
+
+    angles = np.degrees(np.arctan2(x_coords, y_coords))
+    bucket_edges = np.arange(-90, 91, 10)
+    bucket_indices = np.clip(np.digitize(angles, bucket_edges) - 1, 0, len(bucket_edges) - 2)
+
+    depth_buckets = []
+    for i in range(len(bucket_edges) - 1):
+        mask = bucket_indices == i
+        depth_buckets.append(np.mean(y_coords[mask]) if np.any(mask) else 0.0)
+    return depth_buckets
+
+
+@pytest.mark.parametrize('shape', [(600, 600), (256, 256), (480, 640)])
+@pytest.mark.parametrize('scale', [300.0, 3000.0])
+def test_matches_point_cloud_implementation(shape, scale):
+    rng = np.random.default_rng(0)
+    depth = (rng.random(shape) * scale).astype(np.float32)
+    bucketer = DepthBucketer()
+
+    np.testing.assert_allclose(bucketer(depth), point_cloud_buckets(depth), rtol=1e-5, atol=1e-4)
+    # Second call goes through the cached x grid
+    np.testing.assert_allclose(bucketer(depth), point_cloud_buckets(depth), rtol=1e-5, atol=1e-4)
+
+
+def test_smooth_depth_map_matches():
+    # MiDaS-like structure: near ground at the bottom, a close obstacle on the left
+    rows, cols = np.mgrid[0:600, 0:600]
+    depth = (rows * 2.0 + 200 * np.exp(-((cols - 150) ** 2) / 5000)).astype(np.float32)
+
+    np.testing.assert_allclose(DepthBucketer()(depth), point_cloud_buckets(depth), rtol=1e-5, atol=1e-4)
@@ -0,0 +1,30 @@
+import os
+import time
+
+from response_cache import ResponseCache
+
+
+def test_disk_tier_is_pruned_to_its_limit(tmp_path):
+    cache = ResponseCache(persist_dir=str(tmp_path), max_disk_entries=10)
+    for i in range(25):
+        cache.put(f'key{i}', f'text {i}')
+    files = os.listdir(tmp_path)
+    assert len(files) <= 10
+    assert 'key24.json' in files  # newest responses are kept
+    assert cache.stats()['disk_pruned'] >= 15
+
+
+def test_startup_drops_expired_and_oldest_files(tmp_path):
+    writer = ResponseCache(persist_dir=str(tmp_path), max_disk_entries=100)
+    for i in range(6):
+        writer.put(f'key{i}', 'text')
+    old = time.time() - 7200
+    os.utime(tmp_path / 'key0.json', (old, old))
+
+    reader = ResponseCache(persist_dir=str(tmp_path), ttl=3600.0, max_disk_entries=5)
+    files = sorted(os.listdir(tmp_path))
+    assert 'key0.json' not in files
+    assert len(files) <= 4
+    assert reader.stats()['disk_entries'] == len(files)
+    reader.clear()
+    assert reader.get('key5') == 'text'
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import JobScheduler, QueueFull, PRIORITY_SCAN, PRIORITY_READ, PRIORITY_MONITOR
+
+
+@pytest.fixture
+def blocked_scheduler():
+    """One worker held busy by a first job, so everything submitted afterwards queues up"""
+    scheduler = JobScheduler(workers=1, max_queue=8, max_per_session=3)
+    started, release = threading.Event(), threading.Event()
+
+    def blocker(job):
+        started.set()
+        release.wait(5)
+
+    scheduler.submit('blocker', 'scan', blocker)
+    assert started.wait(5)
+    yield scheduler, release
+    release.set()
+    scheduler.shutdown()
+
+
+def run_all(scheduler, release):
+    done = threading.Event()
+    scheduler.submit('last', 'monitor', lambda job: done.set(), PRIORITY_MONITOR + 1)
+    release.set()
+    assert done.wait(5)
+
+
+def test_lanes_run_in_priority_order_fifo_within_lane(blocked_scheduler):
+    scheduler, release = blocked_scheduler
+    order = []
+    scheduler.submit('a', 'monitor', lambda job: order.append('a-monitor'), PRIORITY_MONITOR)
+    scheduler.submit('a', 'read', lambda job: order.append('a-read'), PRIORITY_READ)
+    scheduler.submit('b', 'scan', lambda job: order.append('b-scan'), PRIORITY_SCAN)
+    scheduler.submit('c', 'scan', lambda job: order.append('c-scan'), PRIORITY_SCAN)
+    run_all(scheduler, release)
+    assert order == ['b-scan', 'c-scan', 'a-read', 'a-monitor']
+
+
+def test_pending_job_of_same_kind_is_coalesced(blocked_scheduler):
+    scheduler, release = blocked_scheduler
+    runs = []
+    first = scheduler.submit('a', 'scan', lambda job: runs.append(1))
+    second = scheduler.submit('a', 'scan', lambda job: runs.append(2))
+    assert second is first
+    run_all(scheduler, release)
+    assert runs == [1]
+    assert scheduler.stats()['coalesced'] == 1
+
+
+def test_cancel_session_drops_pending_and_flags_running():
+    scheduler = JobScheduler(workers=1, max_queue=8, max_per_session=3)
+    started, release = threading.Event(), threading.Event()
+    running = scheduler.submit('a', 'scan', lambda job: (started.set(), release.wait(5)))
+    assert started.wait(5)
+    pending = scheduler.submit('a', 'read', lambda job: pytest.fail('cancelled job ran'), PRIORITY_READ)
+
+    scheduler.cancel_session('a')
+    assert running.cancelled and pending.cancelled
+    assert scheduler.queue_depth('a') == 0
+    assert scheduler.stats()['cancelled'] == 1
+
+    done = threading.Event()
+    scheduler.submit('b', 'scan', lambda job: done.set())
+    release.set()
+    assert done.wait(5)
+    scheduler.shutdown()
+
+
+def test_queue_limits_raise_queue_full(blocked_scheduler):
+    scheduler, _ = blocked_scheduler
+    for kind in ('scan', 'read', 'monitor'):
+        scheduler.submit('a', kind, lambda job: None)
+    with pytest.raises(QueueFull):
+        scheduler.submit('a', 'other', lambda job: None)
+    for i in range(5):
+        scheduler.submit(f's{i}', 'scan', lambda job: None)
+    with pytest.raises(QueueFull):
+        scheduler.submit('z', 'scan', lambda job: None)
+    assert scheduler.stats()['rejected'] == 2
+
+
+def test_scans_evict_pending_monitor_checks_instead_of_queue_full(blocked_scheduler):
+    scheduler, release = blocked_scheduler
+    order = []
+    for i in range(8):
+        scheduler.submit(f'm{i}', 'monitor', lambda job, i=i: order.append(f'm{i}'), PRIORITY_MONITOR)
+    scheduler.submit('a', 'scan', lambda job: order.append('a-scan'))
+    scheduler.submit('b', 'read', lambda job: order.append('b-read'), PRIORITY_READ)
+    with pytest.raises(QueueFull):
+        scheduler.submit('m8', 'monitor', lambda job: None, PRIORITY_MONITOR)
+
+    stats = scheduler.stats()
+    assert stats['evicted'] == 2 and stats['rejected'] == 1
+    assert stats['lanes'] == {'scan': 1, 'read': 1, 'monitor': 6}
+    release.set()
+    deadline = time.monotonic() + 5
+    while len(order) < 8 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # The newest monitor checks made room; the older ones still run, after the scan and the read
+    assert order == ['a-scan', 'b-read'] + [f'm{i}' for i in range(6)]
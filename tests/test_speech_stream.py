@@ -0,0 +1,70 @@
+import numpy as np
+
+from speech_stream import StreamingSpeechBuffer
+
+RATE = 16000
+
+
+def mic(seconds: float, utterances: list, seed: int = 0) -> np.ndarray:
+    """Room noise with a voiced burst (start, duration) for every utterance"""
+    rng = np.random.default_rng(seed)
+    pcm = rng.normal(0, 60, int(seconds * RATE))
+    for start, duration in utterances:
+        t = np.arange(int(duration * RATE)) / RATE
+        burst = 8000 * np.sin(np.pi * t / duration) * np.sin(2 * np.pi * 220 * t)
+        offset = int(start * RATE)
+        pcm[offset:offset + len(burst)] += burst
+    return np.clip(pcm, -32768, 32767).astype(np.int16)
+
+
+def feed_chunks(buffer: StreamingSpeechBuffer, timeline: np.ndarray, starts: list, chunk_s: float,
+                timestamps: bool = True) -> list[bytes]:
+    utterances = []
+    for start in starts:
+        chunk = timeline[int(start * RATE):int((start + chunk_s) * RATE)]
+        utterances += buffer.feed(chunk.tobytes(), 1000 * start if timestamps else None)
+    return utterances
+
+
+def test_command_across_back_to_back_chunks_with_restart_gap_fires_once():
+    # The page restarts its recorder between chunks, losing a few ms of audio at every boundary
+    timeline = mic(6.5, [(1.6, 0.8)])
+    utterances = feed_chunks(StreamingSpeechBuffer(), timeline, [0.0, 2.005, 4.01], 2.0)
+    assert len(utterances) == 1
+    assert len(utterances[0]) // 2 >= 0.7 * RATE
+
+
+def test_command_across_overlapping_chunks_fires_once():
+    timeline = mic(6.5, [(1.6, 0.8)])
+    starts = [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert len(feed_chunks(StreamingSpeechBuffer(), timeline, starts, 2.0)) == 1
+
+
+def test_overlap_found_without_timestamps():
+    timeline = mic(6.5, [(1.6, 0.8)])
+    starts = [0.0, 1.0, 2.0, 3.0, 4.0]
+    buffer = StreamingSpeechBuffer()
+    assert len(feed_chunks(buffer, timeline, starts, 2.0, timestamps=False)) == 1
+    assert buffer.stats()['duplicate_ms'] > 3000
+
+
+def test_two_commands_fire_separately():
+    timeline = mic(8.5, [(1.0, 0.8), (4.5, 0.8)])
+    assert len(feed_chunks(StreamingSpeechBuffer(), timeline, [0.0, 2.0, 4.0, 6.0], 2.0)) == 2
+
+
+def test_long_gap_closes_open_utterance():
+    timeline = mic(6.5, [(1.6, 0.8)])
+    buffer = StreamingSpeechBuffer()
+    first = buffer.feed(timeline[:int(2.0 * RATE)].tobytes(), 0.0)
+    assert first == []
+    # One second of audio never arrived: the half command before it is closed on its own
+    assert len(buffer.feed(timeline[int(3.0 * RATE):int(5.0 * RATE)].tobytes(), 3000.0)) == 1
+
+
+def test_silent_chunks_are_counted_as_gated():
+    buffer = StreamingSpeechBuffer()
+    timeline = mic(8.0, [(4.5, 0.8)])
+    feed_chunks(buffer, timeline, [0.0, 2.0, 4.0, 6.0], 2.0)
+    assert buffer.vad.stats()['gated'] == 3
+    assert buffer.vad.stats()['passed'] == 1
@@ -0,0 +1,172 @@
+"""
+Lightweight request tracing and metrics.
+
+    with tracer.span('scan'):              # root span, one per request
+        with tracer.span('depth'):         # nested stage spans
+            ...
+    tracer.count('gemini_requests')
+
+Spans use time.perf_counter(); every finished span feeds a latency histogram named after the span.
+When a root span finishes a one-line breakdown is printed (tracer.log_spans = False silences it,
+the histograms keep recording). render_prometheus() formats histograms, counters and caller
+supplied gauges/counters in the Prometheus text exposition format for /metrics.
+"""
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, cumulative like Prometheus' le buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: tuple = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (coarse, but cheap)"""
+        if not self.count:
+            return 0.0
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+
+class Span:
+    __slots__ = ('name', 'parent', 'start', 'duration', 'children')
+
+    def __init__(self, name: str, parent=None):
+        self.name = name
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.duration = None
+        self.children = []
+
+    def summary(self) -> str:
+        parts = ', '.join(f"{child.name} {child.duration * 1000:.0f}ms" for child in self.children if child.duration is not None)
+        return f"⏱️ {self.name} {self.duration * 1000:.0f}ms" + (f" ({parts})" if parts else '')
+
+
+class Tracer:
+    def __init__(self, log_spans: bool = True):
+        self.log_spans = log_spans
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def current(self):
+        return getattr(self._local, 'span', None)
+
+    @contextmanager
+    def span(self, name: str, parent: Span = None):
+        """Time a block. Nests under the thread's current span, or under parent when the work was
+        handed to another thread."""
+        parent = parent if parent is not None else self.current()
+        span = Span(name, parent)
+        previous = self.current()
+        self._local.span = span
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - span.start
+            self._local.span = previous
+            self.observe(name, span.duration)
+            if parent is not None:
+                parent.children.append(span)
+            elif self.log_spans:
+                print(span.summary())
+
+    def wrap(self, name: str, fn):
+        """fn wrapped in a span that nests under the caller's current span, for executor submits"""
+        parent = self.current()
+
+        def traced(*args, **kwargs):
+            with self.span(name, parent):
+                return fn(*args, **kwargs)
+        return traced
+
+    def traced(self, name: str):
+        """Decorator form of span()"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def traced(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return traced
+        return decorator
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'spans': {name: {'count': h.count, 'mean': h.sum / h.count if h.count else 0.0,
+                                 'p50': h.quantile(0.5), 'p95': h.quantile(0.95)}
+                          for name, h in self._histograms.items()},
+                'counters': dict(self._counters),
+            }
+
+    def render_prometheus(self, gauges: dict = None, counters: dict = None, prefix: str = 'yeongsil') -> str:
+        """Prometheus text format: stage latency histograms, event counters, plus the caller's gauges
+        and counters ({name: value} or {name: {label: value}}, labelled by 'name')"""
+        lines = [f'# HELP {prefix}_stage_seconds Latency of traced stages',
+                 f'# TYPE {prefix}_stage_seconds histogram']
+        with self._lock:
+            for name, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(h.bounds, h.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {h.count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {h.sum:.6f}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {h.count}')
+
+            lines += [f'# HELP {prefix}_events_total Counted events',
+                      f'# TYPE {prefix}_events_total counter']
+            for name, value in sorted(self._counters.items()):
+                lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+
+        for kind, metrics, suffix in (('gauge', gauges, ''), ('counter', counters, '_total')):
+            for name, value in (metrics or {}).items():
+                metric = f'{prefix}_{name}{suffix}'
+                lines.append(f'# TYPE {metric} {kind}')
+                if isinstance(value, dict):
+                    for label, labelled in value.items():
+                        lines.append(f'{metric}{{name="{label}"}} {float(labelled or 0)}')
+                else:
+                    lines.append(f'{metric} {float(value or 0)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide tracer shared by YeongSil and app.py
+tracer = Tracer()
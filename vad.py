@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """Energy + zero-crossing voice activity detector with an adaptive per-session noise floor.
+
+    A 20 ms frame counts as speech when its energy is margin_db above the current noise floor (and
+    above an absolute minimum) and its zero-crossing rate is below max_zcr, which rejects broadband
+    hiss. An utterance is forwarded to ASR when it holds at least min_speech_ms of speech frames. The
+    noise floor tracks the non-speech frames: it follows drops quickly and rises slowly.
+
+    gated/passed count audio chunks without/with any speech frame (StreamingSpeechBuffer.feed).
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 20, margin_db: float = 10.0,
+                 min_energy_db: float = -55.0, max_zcr: float = 0.35, min_speech_ms: int = 120,
+                 rise_rate: float = 0.05, fall_rate: float = 0.5):
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.frame_ms = frame_ms
+        self.margin_db = margin_db
+        self.min_energy_db = min_energy_db
+        self.max_zcr = max_zcr
+        self.min_speech_ms = min_speech_ms
+        self.rise_rate = rise_rate
+        self.fall_rate = fall_rate
+
+        self.noise_floor_db = None
+        self.gated = 0
+        self.passed = 0
+
+    def frame_features(self, pcm: bytes) -> tuple[np.ndarray, np.ndarray]:
+        """Per-frame energy (dBFS) and zero-crossing rate of 16-bit mono PCM"""
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        n_frames = len(samples) // self.frame_len
+        frames = samples[:n_frames * self.frame_len].reshape(n_frames, self.frame_len)
+        energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+        return energy_db, zcr
+
+    def speech_frames(self, pcm: bytes) -> np.ndarray:
+        """Boolean speech mask per frame; also adapts the noise floor"""
+        energy_db, zcr = self.frame_features(pcm)
+        if energy_db.size == 0:
+            return np.zeros(0, dtype=bool)
+        if self.noise_floor_db is None:
+            self.noise_floor_db = float(np.percentile(energy_db, 10))
+
+        speech = ((energy_db > self.noise_floor_db + self.margin_db)
+                  & (energy_db > self.min_energy_db)
+                  & (zcr < self.max_zcr))
+
+        quiet = energy_db[~speech]
+        if quiet.size:
+            target = float(np.median(quiet))
+            rate = self.fall_rate if target < self.noise_floor_db else self.rise_rate
+            self.noise_floor_db += rate * (target - self.noise_floor_db)
+        return speech
+
+    def stats(self) -> dict:
+        return {
+            'gated': self.gated,
+            'passed': self.passed,
+            'noise_floor_db': self.noise_floor_db,
+        }